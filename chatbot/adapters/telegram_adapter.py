@@ -1,21 +1,29 @@
+import hmac
 import os
 import requests
 import threading
 import time
-from typing import Optional, Callable
+import uuid
+from concurrent.futures import Future, wait
+from typing import Optional, Callable, List
 from datetime import datetime
 from dotenv import load_dotenv
-import redis
+from redis.exceptions import WatchError
+from state.redis_client import create_redis_client
+from monitoring.metrics import STAGE_LATENCY, TELEGRAM_POLLING_LAG
+from .telegram_sender import TelegramSender
 
 class TelegramAdapter:
     """Adaptador para integração com a API do Telegram Bot"""
     
-    def __init__(self):
+    def __init__(self, redis_client=None):
         load_dotenv(override=True)
         
         # Obtém as configurações do Telegram
         self.api_url = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
+        # Segredo enviado pelo Telegram no cabeçalho X-Telegram-Bot-Api-Secret-Token
+        self.webhook_secret = os.getenv("TELEGRAM_WEBHOOK_SECRET")
         
         self.last_update_id = 0
         self.message_handler = None
@@ -23,20 +31,41 @@ class TelegramAdapter:
         self.is_polling = False
         
         # Configuração do Redis para lock distribuído
-        redis_host = os.getenv("REDIS_HOST", "redis")
-        redis_port = int(os.getenv("REDIS_PORT", "6379"))
-        self.redis_client = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
+        self.redis_client = redis_client or create_redis_client()
         self.lock_key = "telegram_polling_lock"
-        self.lock_ttl = 30  # segundos
+        self.lock_ttl = int(os.getenv("TELEGRAM_LOCK_TTL_SECONDS", "30"))  # segundos
+        # Token único desta instância: só quem detém o lock pode renová-lo ou liberá-lo
+        self.lock_token = str(uuid.uuid4())
+        self.has_lock = False
+        self.heartbeat_thread = None
+        
+        # Offset e atualizações já processadas ficam no Redis, compartilhados entre réplicas
+        self.offset_key = "telegram:update_offset"
+        self.processed_key = "telegram:processed_updates"
+        self.processed_retention = int(os.getenv("TELEGRAM_DEDUPE_RETENTION_SECONDS", "86400"))
         
         # Valida as configurações
         if not self.bot_token:
             raise ValueError("TELEGRAM_BOT_TOKEN não configurado no arquivo .env")
+        
+        # Conexão keep-alive reaproveitada pelo getUpdates
+        self.session = requests.Session()
+        
+        # Envio de respostas em segundo plano, com limite de taxa do Telegram
+        self.sender = TelegramSender(
+            self.api_url,
+            self.bot_token,
+            workers=int(os.getenv("TELEGRAM_SENDER_WORKERS", "8")),
+            queue_size=int(os.getenv("TELEGRAM_SENDER_QUEUE_SIZE", "1000")),
+            global_rate=float(os.getenv("TELEGRAM_GLOBAL_RATE", "30")),
+            chat_rate=float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+        )
     
-    def start_polling(self, message_handler: Callable[[str, str], None]):
+    def start_polling(self, message_handler: Callable[[str, str], Optional[Future]]):
         """
         Inicia o polling de mensagens do Telegram
-        message_handler: função que será chamada quando uma mensagem for recebida
+        message_handler: função que será chamada quando uma mensagem for recebida.
+        Se retornar um Future, o lote só é confirmado após sua conclusão.
         """
         self.message_handler = message_handler
         self.is_polling = True
@@ -50,79 +79,207 @@ class TelegramAdapter:
         self.is_polling = False
         if self.polling_thread:
             self.polling_thread.join()
+        self._release_lock()
     
     def _acquire_lock(self) -> bool:
-        """Tenta adquirir o lock distribuído"""
-        return self.redis_client.set(
-            self.lock_key,
-            "1",
-            ex=self.lock_ttl,
-            nx=True
-        )
+        """Tenta adquirir o lock distribuído e inicia sua renovação periódica"""
+        if not self.redis_client.set(self.lock_key, self.lock_token, ex=self.lock_ttl, nx=True):
+            return False
+        self.has_lock = True
+        if self.heartbeat_thread is None or not self.heartbeat_thread.is_alive():
+            self.heartbeat_thread = threading.Thread(target=self._renew_lock, daemon=True)
+            self.heartbeat_thread.start()
+        print("Lock de polling do Telegram adquirido")
+        return True
+    
+    def _if_lock_owner(self, operations: Callable) -> bool:
+        """
+        Executa `operations(pipeline)` em uma transação que só é aplicada se
+        esta instância ainda detém o lock
+        """
+        with self.redis_client.pipeline() as pipeline:
+            try:
+                pipeline.watch(self.lock_key)
+                if pipeline.get(self.lock_key) != self.lock_token:
+                    pipeline.unwatch()
+                    return False
+                pipeline.multi()
+                operations(pipeline)
+                pipeline.execute()
+                return True
+            except WatchError:
+                return False
+    
+    def _renew_lock(self):
+        """Renova o lock a cada terço do TTL enquanto o polling estiver ativo"""
+        while self.is_polling and self.has_lock:
+            time.sleep(self.lock_ttl / 3)
+            try:
+                if not self.has_lock:
+                    break
+                if not self._if_lock_owner(lambda pipeline: pipeline.expire(self.lock_key, self.lock_ttl)):
+                    print("Lock de polling do Telegram perdido")
+                    self.has_lock = False
+            except Exception as e:
+                print(f"Erro ao renovar lock do Telegram: {str(e)}")
     
     def _release_lock(self):
-        """Libera o lock distribuído"""
-        self.redis_client.delete(self.lock_key)
+        """Libera o lock distribuído, se ainda pertencer a esta instância"""
+        if not self.has_lock:
+            return
+        self.has_lock = False
+        try:
+            self._if_lock_owner(lambda pipeline: pipeline.delete(self.lock_key))
+        except Exception as e:
+            print(f"Erro ao liberar lock do Telegram: {str(e)}")
+    
+    def _load_offset(self) -> int:
+        """Último update_id confirmado por qualquer réplica"""
+        return int(self.redis_client.get(self.offset_key) or 0)
+    
+    def _already_processed(self, update_ids: List[int]) -> List[bool]:
+        """Consulta em lote quais atualizações já foram processadas"""
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for update_id in update_ids:
+            pipeline.zscore(self.processed_key, update_id)
+        return [score is not None for score in pipeline.execute()]
+    
+    def _mark_processed(self, update_id: int):
+        """Registra uma atualização processada, antes mesmo de o lote ser confirmado"""
+        self.redis_client.zadd(self.processed_key, {update_id: time.time()})
+    
+    def _commit_batch(self, update_ids: List[int]) -> bool:
+        """
+        Confirma o lote de forma atômica: avança o offset, registra as
+        atualizações processadas e descarta registros antigos. Não confirma
+        nada se o lock tiver passado para outra réplica.
+        """
+        now = time.time()
+        
+        def operations(pipeline):
+            pipeline.set(self.offset_key, max(update_ids))
+            pipeline.zadd(self.processed_key, {update_id: now for update_id in update_ids})
+            pipeline.zremrangebyscore(self.processed_key, "-inf", now - self.processed_retention)
+        
+        return self._if_lock_owner(operations)
+    
+    def _handle_update(self, update: dict) -> Optional[Future]:
+        """Entrega a mensagem ao handler; retorna o Future, se houver"""
+        if "message" in update and "text" in update["message"]:
+            chat_id = str(update["message"]["chat"]["id"])
+            text = update["message"]["text"]
+            
+            if self.message_handler:
+                result = self.message_handler(chat_id, text)
+                if isinstance(result, Future):
+                    return result
+        return None
     
     def _poll_messages(self):
         """Método interno para fazer polling de mensagens"""
         while self.is_polling:
             try:
-                # Tenta adquirir o lock
-                if not self._acquire_lock():
+                # Mantém o lock entre lotes; sem ele, aguarda outra réplica liberar
+                if not self.has_lock and not self._acquire_lock():
                     time.sleep(1)
                     continue
                 
-                try:
-                    url = f"{self.api_url}{self.bot_token}/getUpdates"
-                    params = {
-                        "offset": self.last_update_id + 1,
-                        "timeout": 10  # 10 segundos para o polling
-                    }
-                    
-                    response = requests.get(url, params=params)
-                    response.raise_for_status()
-                    
-                    updates = response.json().get("result", [])
+                # O offset é sempre lido do Redis, pois outra réplica pode ter avançado
+                self.last_update_id = self._load_offset()
+                url = f"{self.api_url}{self.bot_token}/getUpdates"
+                params = {
+                    "offset": self.last_update_id + 1,
+                    "timeout": 10  # 10 segundos para o polling
+                }
+                
+                with STAGE_LATENCY.time(stage="telegram_get_updates"):
+                    response = self.session.get(url, params=params, timeout=params["timeout"] + 5)
+                response.raise_for_status()
+                
+                updates = response.json().get("result", [])
+                if not updates:
+                    TELEGRAM_POLLING_LAG.set(0)
+                    continue
+                
+                # Atraso da mensagem mais antiga do lote (campo date, em segundos)
+                oldest = min((update.get("message", {}).get("date") for update in updates
+                              if update.get("message", {}).get("date")), default=None)
+                if oldest:
+                    TELEGRAM_POLLING_LAG.set(max(0.0, time.time() - oldest))
+                
+                update_ids = [update["update_id"] for update in updates]
+                processed = self._already_processed(update_ids)
+                
+                # Conversas diferentes são processadas em paralelo; cada atualização
+                # é registrada como processada assim que termina
+                pending = []
+                for update, done in zip(updates, processed):
+                    if not self.has_lock:
+                        break
+                    if done:
+                        continue
                     
-                    for update in updates:
-                        self.last_update_id = update["update_id"]
-                        
-                        if "message" in update and "text" in update["message"]:
-                            chat_id = str(update["message"]["chat"]["id"])
-                            text = update["message"]["text"]
-                            
-                            if self.message_handler:
-                                self.message_handler(chat_id, text)
+                    update_id = update["update_id"]
+                    future = self._handle_update(update)
+                    if future is None:
+                        self._mark_processed(update_id)
+                    else:
+                        future.add_done_callback(lambda _, update_id=update_id: self._mark_processed(update_id))
+                        pending.append(future)
+                
+                # Erros do handler já são registrados por quem o executa
+                wait(pending)
+                
+                if self.has_lock and self._commit_batch(update_ids):
+                    self.last_update_id = max(update_ids)
+                    continue
                 
-                finally:
-                    # Sempre libera o lock ao finalizar
-                    self._release_lock()
+                print("Lock de polling do Telegram perdido; lote não confirmado")
+                self.has_lock = False
                 
             except Exception as e:
                 print(f"Erro no polling do Telegram: {str(e)}")
                 time.sleep(5)  # Espera 5 segundos antes de tentar novamente
     
-    def send_message(self, chat_id: str, message: str) -> bool:
+    def set_webhook(self, url: str) -> bool:
         """
-        Envia uma mensagem via Telegram Bot API
+        Registra a URL do webhook no Telegram, com o segredo que será
+        verificado em cada requisição recebida
         """
+        if not self.webhook_secret:
+            raise ValueError("TELEGRAM_WEBHOOK_SECRET não configurado no arquivo .env")
         try:
-            url = f"{self.api_url}{self.bot_token}/sendMessage"
-            
-            data = {
-                "chat_id": chat_id,
-                "text": message,
-                "parse_mode": "HTML"
-            }
-            
-            response = requests.post(url, json=data)
+            response = requests.post(
+                f"{self.api_url}{self.bot_token}/setWebhook",
+                json={
+                    "url": url,
+                    "secret_token": self.webhook_secret,
+                    "allowed_updates": ["message"]
+                },
+                timeout=10
+            )
             response.raise_for_status()
-            
+            print(f"Webhook do Telegram registrado em {url}")
             return True
         except Exception as e:
-            print(f"Erro ao enviar mensagem Telegram: {str(e)}")
+            print(f"Erro ao registrar webhook Telegram: {str(e)}")
+            return False
+
+    def verify_webhook_secret(self, secret: Optional[str]) -> bool:
+        """Verifica o segredo recebido no cabeçalho do webhook"""
+        if not self.webhook_secret or not secret:
+            return False
+        return hmac.compare_digest(secret.encode('utf-8'), self.webhook_secret.encode('utf-8'))
+
+    def send_message(self, chat_id: str, message: str) -> bool:
+        """
+        Enfileira uma mensagem para envio via Telegram Bot API
+        Retorna False se a fila de envio estiver cheia
+        """
+        if not self.sender.send(chat_id, message):
+            print(f"Fila de envio do Telegram cheia; mensagem para {chat_id} descartada")
             return False
+        return True
     
     def handle_webhook(self, data: dict) -> Optional[tuple[str, str]]:
         """
@@ -0,0 +1,234 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from monitoring.metrics import STAGE_LATENCY
+from workers.keyed_dispatcher import KeyedDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Limitador de taxa: `rate` envios por segundo, com rajadas de até
+    `capacity`. `acquire` bloqueia até haver uma ficha disponível e
+    `try_acquire` apenas informa quanto falta esperar.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self) -> float:
+        """Consome uma ficha e retorna 0, ou retorna os segundos até haver uma"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def is_idle(self) -> bool:
+        """Balde cheio: o chat não envia há tempo suficiente para ser descartado"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens >= self.capacity
+
+
+class TelegramSender:
+    """
+    Envio assíncrono de mensagens para a API do Telegram.
+
+    As mensagens de cada chat ficam em uma fila própria e saem em ordem, uma
+    de cada vez, pelas threads de um KeyedDispatcher que compartilham uma
+    `requests.Session` (conexões keep-alive). O total de mensagens pendentes
+    é limitado a `queue_size`. Os envios respeitam os limites do Telegram com
+    token buckets global (`global_rate` por segundo) e por chat (`chat_rate`
+    por segundo), e respostas 429 são repetidas após o `retry_after`
+    informado pela API.
+
+    A espera pelo limite do chat e as novas tentativas (429 e falhas
+    temporárias) são agendadas com `submit_after` em vez de dormir na thread,
+    que segue atendendo os outros chats enquanto isso.
+    """
+
+    def __init__(self, api_url: str, bot_token: str, workers: int = 8, queue_size: int = 1000,
+                 global_rate: float = 30.0, chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 max_retries: int = 5, timeout: float = 10.0):
+        self.url = f"{api_url}{bot_token}/sendMessage"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.queue_size = queue_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+
+        # Mensagens pendentes por chat: [texto, tentativas]; a primeira é a próxima a sair
+        self._pending: Dict[str, Deque[List]] = {}
+        self._pending_count = 0
+        self._pending_condition = threading.Condition()
+
+        self.dispatcher = KeyedDispatcher(workers=workers, queue_size=queue_size, name="telegram-sender")
+        self._counter_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.rate_limited = 0
+        self.dropped = 0
+
+    def _count(self, counter: str):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        with self._buckets_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                # Descarta os baldes de chats ociosos para não crescer sem limite
+                if len(self._chat_buckets) >= 10000:
+                    for idle in [key for key, value in self._chat_buckets.items() if value.is_idle()]:
+                        del self._chat_buckets[idle]
+                bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            return bucket
+
+    def send(self, chat_id: str, message: str) -> bool:
+        """Enfileira a mensagem; retorna False se a fila estiver cheia"""
+        with self._pending_condition:
+            if self._pending_count >= self.queue_size:
+                self._count('dropped')
+                return False
+            messages = self._pending.get(chat_id)
+            idle = messages is None
+            if idle:
+                messages = self._pending[chat_id] = deque()
+            messages.append([message, 0])
+            self._pending_count += 1
+        # Só o chat ocioso é agendado; os demais já têm um envio em andamento
+        if idle and self.dispatcher.submit(chat_id, self._deliver, chat_id) is None:
+            with self._pending_condition:
+                self._finish(chat_id, messages)
+                self._count('dropped')
+            return False
+        return True
+
+    def _finish(self, chat_id: str, messages: Deque[List]):
+        """Remove a primeira mensagem do chat (com o lock de pendências)"""
+        messages.popleft()
+        self._pending_count -= 1
+        if not messages:
+            del self._pending[chat_id]
+        self._pending_condition.notify_all()
+
+    def _deliver(self, chat_id: str):
+        """
+        Tenta enviar a primeira mensagem pendente do chat e agenda a próxima,
+        ou uma nova tentativa, sem bloquear a thread com esperas
+        """
+        with self._pending_condition:
+            messages = self._pending[chat_id]
+            entry = messages[0]
+
+        wait = self._chat_bucket(chat_id).try_acquire()
+        if wait:
+            self.dispatcher.submit_after(wait, chat_id, self._deliver, chat_id)
+            return
+
+        try:
+            delay = self._attempt(chat_id, entry[0], entry[1])
+        except Exception as e:
+            # Erro inesperado: descarta a mensagem para não travar a fila do chat
+            logger.error(f"Erro ao enviar mensagem Telegram: {str(e)}")
+            delay = None
+            self._count('failed')
+        if delay is not None and entry[1] < self.max_retries:
+            entry[1] += 1
+            self._count('retried')
+            self.dispatcher.submit_after(delay, chat_id, self._deliver, chat_id)
+            return
+        if delay is not None:
+            self._count('failed')
+
+        with self._pending_condition:
+            self._finish(chat_id, messages)
+            has_more = chat_id in self._pending
+        if has_more:
+            self.dispatcher.submit_after(0, chat_id, self._deliver, chat_id)
+
+    def _attempt(self, chat_id: str, message: str, attempt: int):
+        """
+        Faz um envio. Retorna None quando a mensagem está resolvida (enviada ou
+        com erro definitivo) ou os segundos até a próxima tentativa
+        """
+        data = {
+            "chat_id": chat_id,
+            "text": message,
+            "parse_mode": "HTML"
+        }
+        # O limite global é curto (1/global_rate) e vale para todos os chats
+        self.global_bucket.acquire()
+        try:
+            with STAGE_LATENCY.time(stage="telegram_send"):
+                response = self.session.post(self.url, json=data, timeout=self.timeout)
+            if response.status_code == 429:
+                self._count('rate_limited')
+                retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                logger.warning(f"Limite do Telegram atingido; nova tentativa em {retry_after}s")
+                return retry_after
+            if response.status_code >= 500:
+                return min(2 ** attempt, 30)
+            response.raise_for_status()
+            self._count('sent')
+            return None
+        except requests.exceptions.HTTPError as e:
+            # Erros 4xx (chat inexistente, bot bloqueado) não adiantam repetir
+            logger.error(f"Erro ao enviar mensagem Telegram: {str(e)}")
+            self._count('failed')
+            return None
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Falha de conexão com o Telegram: {str(e)}")
+            return min(2 ** attempt, 30)
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._pending_count,
+            'dropped': self.dropped,
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'rate_limited': self.rate_limited,
+        }
+
+    def shutdown(self, timeout: float = 30.0):
+        """Envia o que está pendente (por até `timeout` segundos) e fecha as conexões"""
+        with self._pending_condition:
+            if not self._pending_condition.wait_for(lambda: not self._pending_count, timeout):
+                logger.warning(f"{self._pending_count} mensagens do Telegram não enviadas no encerramento")
+        self.dispatcher.shutdown()
+        self.session.close()
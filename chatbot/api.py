@@ -1,23 +1,187 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import Optional
-from main import create_and_train_bot, setup_services
+from typing import Dict, List, Optional
+from main import LEARNING_MODE, create_and_train_bot, setup_services
+from monitoring.health import ReadinessChecker
+from monitoring.metrics import REGISTRY, RESPONSES, STAGE_LATENCY
+from monitoring.startup import StartupTimeline
 from adapters.telegram_adapter import TelegramAdapter
+from services.keyword_matcher import KeywordMatcher
+from state.redis_client import create_redis_client
+from state.store import create_state_store
+from workers.chat_pool import ChatWorkerPool, PoolSaturated
+from workers.keyed_dispatcher import KeyedDispatcher
 import logging
+import pymongo
+import threading
 import uuid
 import time
 import os
-from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from redis.backoff import NoBackoff
+from redis.retry import Retry
 
 # Carrega variáveis de ambiente
 load_dotenv(override=True)
 
+# Fases da inicialização (importação do NLP, treinamento, índice, conexões)
+startup_timeline = StartupTimeline()
+
+# Configuração do timeout (em minutos)
+SESSION_TIMEOUT_MINUTES = int(os.getenv('SESSION_TIMEOUT_MINUTES', '15'))
+
+# Sessões expiradas continuam guardadas por mais este período (em minutos) para
+# que o usuário receba o aviso de timeout; depois disso o backend as descarta
+SESSION_RETENTION_MINUTES = int(os.getenv('SESSION_RETENTION_MINUTES', '60'))
+
+# Pool de threads que processa as mensagens fora do event loop. Acima de
+# CHAT_MAX_PENDING requisições em andamento a API responde 503 com Retry-After
+CHAT_WORKERS = int(os.getenv('CHAT_WORKERS', '8'))
+CHAT_MAX_PENDING = int(os.getenv('CHAT_MAX_PENDING', '64'))
+CHAT_RETRY_AFTER_SECONDS = int(os.getenv('CHAT_RETRY_AFTER_SECONDS', '2'))
+# Máximo de mensagens aceitas em uma chamada do /chat/batch
+CHAT_BATCH_MAX_ITEMS = int(os.getenv('CHAT_BATCH_MAX_ITEMS', '100'))
+chat_pool = ChatWorkerPool(workers=CHAT_WORKERS, max_pending=CHAT_MAX_PENDING)
+
+# Ambiente e número de processos definidos por main.py (--cluster e --workers).
+# Com várias réplicas ou workers o estado precisa ficar no Redis, e no Kubernetes
+# o Telegram é recebido por webhook em vez de polling dentro do processo
+CLUSTER_MODE = os.getenv('CHATBOT_CLUSTER', 'local')
+SERVER_WORKERS = int(os.getenv('CHATBOT_WORKERS', '1'))
+STATE_BACKEND = 'redis' if CLUSTER_MODE == 'kubernetes' or SERVER_WORKERS > 1 else None
+
+# Mensagens do Telegram são processadas por um pool que serializa por chat_id
+# e atende conversas diferentes em paralelo
+TELEGRAM_MODE = 'webhook' if CLUSTER_MODE == 'kubernetes' else os.getenv('TELEGRAM_MODE', 'polling')
+
+def redis_required() -> bool:
+    """
+    O Redis só é conectado na inicialização e verificado no /ready quando algum
+    componente configurado depende dele: estado no Redis, LEARNING_MODE=redis,
+    segundo nível do cache de respostas ou polling do Telegram
+    """
+    response_cache_redis = (
+        int(os.getenv('RESPONSE_CACHE_SIZE', '10000')) > 0
+        and os.getenv('RESPONSE_CACHE_REDIS', 'false').lower() == 'true'
+    )
+    return (
+        (STATE_BACKEND or os.getenv('STATE_BACKEND', 'memory')) == 'redis'
+        or LEARNING_MODE == 'redis'
+        or response_cache_redis
+        or TELEGRAM_MODE == 'polling'
+    )
+
+REDIS_REQUIRED = redis_required()
+
+telegram_dispatcher = KeyedDispatcher(
+    workers=int(os.getenv('TELEGRAM_WORKERS', '8')),
+    queue_size=int(os.getenv('TELEGRAM_QUEUE_SIZE', '256')),
+    name="telegram"
+)
+
+# Componentes criados por initialize(), fora da importação do módulo
+chatbot = None
+redis_client = None
+response_cache = None
+learning_queue = None
+responder = None
+state_store = None
+service_manager = None
+telegram = None
+
+def initialize():
+    """
+    Inicializa o chatbot, o gerenciador de serviços e o adaptador do Telegram,
+    registrando a duração de cada fase
+    """
+    global chatbot, redis_client, response_cache, learning_queue, responder, state_store, service_manager, telegram
+
+    # O treinamento só é refeito quando o snapshot persistido está desatualizado
+    chatbot = create_and_train_bot(
+        force_training=os.getenv('FORCE_TRAINING', 'false').lower() == 'true',
+        timeline=startup_timeline
+    )
+
+    if REDIS_REQUIRED:
+        with startup_timeline.phase("redis"):
+            redis_client = create_redis_client()
+            redis_client.ping()
+
+    with startup_timeline.phase("services"):
+        from logic.responder import Responder
+        from logic.response_cache import create_response_cache
+        from workers.learning_queue import create_learning_queue
+
+        # Respostas de perguntas repetidas ficam em cache até o próximo treinamento
+        response_cache = create_response_cache(chatbot.training_hash, redis_client)
+        # Fora do modo sync, o aprendizado é gravado em segundo plano (LEARNING_MODE)
+        learning_queue = create_learning_queue(LEARNING_MODE, chatbot.storage, redis_client)
+        responder = Responder(chatbot, response_cache, learning_queue)
+        # Estado das sessões e dos serviços: em memória ou no Redis (STATE_BACKEND)
+        state_store = create_state_store(redis_client, STATE_BACKEND)
+        state_store.add_eviction_listener(_on_state_evicted)
+        service_manager = setup_services(chatbot, state_store)
+
+    with startup_timeline.phase("telegram"):
+        telegram = TelegramAdapter(redis_client)
+        if TELEGRAM_MODE == 'webhook':
+            # Cada réplica recebe as atualizações pelo endpoint /telegram/webhook.
+            # Sem o segredo todas as atualizações seriam recusadas com 401
+            if not telegram.webhook_secret:
+                raise RuntimeError(
+                    "TELEGRAM_MODE=webhook (ou --cluster kubernetes) exige TELEGRAM_WEBHOOK_SECRET"
+                )
+            webhook_url = os.getenv('TELEGRAM_WEBHOOK_URL')
+            if webhook_url:
+                telegram.set_webhook(webhook_url)
+            else:
+                logging.warning(
+                    "TELEGRAM_WEBHOOK_URL não configurado; o webhook precisa ser registrado externamente"
+                )
+        else:
+            # Inicia o polling do Telegram; a fila cheia segura o polling (backpressure)
+            # O polling aguarda o Future de cada mensagem antes de confirmar o lote
+            telegram.start_polling(lambda chat_id, message: telegram_dispatcher.submit(
+                chat_id, handle_telegram_message, chat_id, message, block=True
+            ))
+
+    _collect_gauges()
+    startup_timeline.finish()
+    logging.info(f"Chatbot inicializado com timeout de sessão: {SESSION_TIMEOUT_MINUTES} minutos")
+
+def _run_startup():
+    try:
+        initialize()
+    except Exception as e:
+        startup_timeline.fail(e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    A inicialização roda em segundo plano: o servidor começa a responder o
+    /live imediatamente e o /ready só fica 200 depois que ela termina
+    """
+    threading.Thread(target=_run_startup, name="startup", daemon=True).start()
+    yield
+    # Aguarda as mensagens em andamento antes de encerrar o processo
+    if telegram is not None and telegram.is_polling:
+        telegram.stop_polling()
+    chat_pool.shutdown()
+    telegram_dispatcher.shutdown()
+    if telegram is not None:
+        telegram.sender.shutdown()
+    # Grava o aprendizado ainda na fila
+    if learning_queue is not None:
+        learning_queue.stop()
+
 app = FastAPI(
     title="CNJ Chatbot API",
     description="API para interagir com o chatbot do CNJ",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configuração do CORS
@@ -29,35 +193,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Inicializa o chatbot, o gerenciador de serviços e o adaptador do Telegram
-chatbot = create_and_train_bot()
-service_manager = setup_services(chatbot)
-telegram = TelegramAdapter()
-
-# Cache para armazenar session_ids e timestamps por user_id
-session_cache = {}
-session_timestamps = {}
-
-# Configuração do timeout (em minutos)
-SESSION_TIMEOUT_MINUTES = int(os.getenv('SESSION_TIMEOUT_MINUTES', '15'))
-
-logging.info(f"Chatbot inicializado com timeout de sessão: {SESSION_TIMEOUT_MINUTES} minutos")
+def ensure_started():
+    """
+    Responde 503 enquanto a inicialização não terminou
+    """
+    if not startup_timeline.completed:
+        raise HTTPException(
+            status_code=503,
+            detail="Chatbot em inicialização. Tente novamente em instantes.",
+            headers={"Retry-After": str(CHAT_RETRY_AFTER_SECONDS)}
+        )
 
 # Função para processar mensagens do Telegram
 def handle_telegram_message(chat_id: str, message: str):
     # Processa a mensagem com o chatbot
-    service_response, continue_service, status = service_manager.handle_message(chat_id, message)
+    with STAGE_LATENCY.time(stage="services"):
+        service_response, continue_service, status = service_manager.handle_message(chat_id, message)
     
     if service_response:
         # Envia a resposta via Telegram
         telegram.send_message(chat_id, service_response)
     else:
         # Se nenhum serviço respondeu, usa o ChatterBot
-        response = chatbot.get_response(message)
-        telegram.send_message(chat_id, str(response))
+        response = responder.get_response(message)
+        status = determine_chatterbot_status(response.text)
+        telegram.send_message(chat_id, response.text)
+    RESPONSES.inc(channel="telegram", status=status)
 
-# Inicia o polling do Telegram
-telegram.start_polling(handle_telegram_message)
+def enqueue_telegram_message(chat_id: str, message: str, block: bool = False) -> bool:
+    """
+    Enfileira a mensagem para processamento; retorna False se a fila estiver cheia
+    """
+    return telegram_dispatcher.submit(
+        chat_id, handle_telegram_message, chat_id, message, block=block
+    ) is not None
 
 class ChatRequest(BaseModel):
     message: str
@@ -71,47 +240,76 @@ class ChatResponse(BaseModel):
     status: int
     session_id: str
 
-def get_or_create_session_id(user_id: str) -> str:
+class ChatBatchRequest(BaseModel):
+    requests: List[ChatRequest]
+
+class ChatBatchItem(BaseModel):
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+class ChatBatchResponse(BaseModel):
+    responses: List[ChatBatchItem]
+
+# Tempo de vida das sessões no backend, incluindo o período de retenção
+SESSION_TTL_SECONDS = (SESSION_TIMEOUT_MINUTES + SESSION_RETENTION_MINUTES) * 60
+
+def _session_key(user_id: str) -> str:
+    return f"session:{user_id}"
+
+def load_session(user_id: str) -> Optional[dict]:
+    """
+    Lê a sessão do usuário (uma única leitura por requisição)
+    """
+    return state_store.get(_session_key(user_id))
+
+def get_or_create_session_id(user_id: str, session: Optional[dict] = None) -> str:
     """
     Obtém ou cria um session_id para o user_id
     """
-    if user_id not in session_cache:
-        session_cache[user_id] = str(uuid.uuid4())
-        session_timestamps[user_id] = datetime.now()
-    else:
-        # Atualiza o timestamp da sessão
-        session_timestamps[user_id] = datetime.now()
-    return session_cache[user_id]
+    if session is None:
+        session = load_session(user_id)
+    session = touch_session(session)
+    state_store.set(_session_key(user_id), session, ttl=SESSION_TTL_SECONDS)
+    return session["session_id"]
 
-def check_session_timeout(user_id: str) -> bool:
+def touch_session(session: Optional[dict]) -> dict:
+    """
+    Cria a sessão, se necessário, e atualiza o timestamp da última atividade
+    """
+    session = session or {"session_id": str(uuid.uuid4())}
+    session["last_activity"] = time.time()
+    return session
+
+def check_session_timeout(user_id: str, session: Optional[dict] = None) -> bool:
     """
     Verifica se a sessão do usuário expirou por timeout
     """
-    if user_id not in session_timestamps:
+    if session is None:
+        session = load_session(user_id)
+    if not session:
         return False
     
-    last_activity = session_timestamps[user_id]
-    timeout_threshold = datetime.now() - timedelta(minutes=SESSION_TIMEOUT_MINUTES)
+    timeout_threshold = time.time() - SESSION_TIMEOUT_MINUTES * 60
     
-    return last_activity < timeout_threshold
+    return session["last_activity"] < timeout_threshold
 
 def clear_session(user_id: str):
     """
     Limpa a sessão do usuário
     """
-    if user_id in session_cache:
-        del session_cache[user_id]
-    if user_id in session_timestamps:
-        del session_timestamps[user_id]
+    state_store.delete(_session_key(user_id))
 
-def determine_chatterbot_status(response_text: str) -> int:
+def _on_state_evicted(key: str):
     """
-    Determina o status para respostas do ChatterBot
+    Quando o backend descarta uma sessão expirada ou excedente,
+    descarta também o estado do usuário nos serviços
     """
-    response_lower = response_text.lower()
-    
-    # Verifica se é finalização da conversa
-    end_conversation_keywords = [
+    if key.startswith("session:"):
+        service_manager.clear_user(key[len("session:"):])
+
+# Palavras-chave que indicam finalização da conversa nas respostas do ChatterBot
+END_CONVERSATION_MATCHER = KeywordMatcher({
+    'end': [
         "até logo",
         "obrigado por utilizar",
         "tchau",
@@ -119,101 +317,441 @@ def determine_chatterbot_status(response_text: str) -> int:
         "encerrando",
         "finalizando"
     ]
-    
-    if any(keyword in response_lower for keyword in end_conversation_keywords):
+})
+
+def determine_chatterbot_status(response_text: str) -> int:
+    """
+    Determina o status para respostas do ChatterBot
+    """
+    # Verifica se é finalização da conversa
+    if END_CONVERSATION_MATCHER.find(response_text):
         return 204
     
     # Resposta normal
     return 200
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+def process_chat(user_id: str, request: ChatRequest) -> ChatResponse:
     """
-    Endpoint para enviar mensagens ao chatbot e receber respostas
-    
-    Status codes:
-    - 200: Resposta normal do chatbot
-    - 204: Conversa finalizada pelo bot (timeout ou comando de saída)
-    - 205: Transferência para atendente humano
+    Processa a mensagem de forma síncrona (executado no pool de workers)
     """
     try:
-        # Gera um ID de usuário se não foi fornecido
-        user_id = request.user_id or "default_user"
-        
         # Verifica se a sessão expirou por timeout
-        if check_session_timeout(user_id):
+        with STAGE_LATENCY.time(stage="session_load"):
+            session = load_session(user_id)
+        if check_session_timeout(user_id, session):
             # Limpa a sessão expirada
             clear_session(user_id)
-            return ChatResponse(
-                response="Sua sessão expirou por inatividade. Para continuar, envie uma nova mensagem.",
-                confidence=1.0,
-                response_id="session_timeout",
-                question_id="session_timeout",
-                status=204,  # Conversa finalizada por timeout
-                session_id=""
-            )
+            return session_timeout_response()
         
         # Obtém ou cria o session_id para o usuário
-        session_id = get_or_create_session_id(user_id)
+        with STAGE_LATENCY.time(stage="session_save"):
+            session_id = get_or_create_session_id(user_id, session)
         
         # Primeiro, tenta processar com os serviços
-        service_response, continue_service, status = service_manager.handle_message(user_id, request.message)
+        with STAGE_LATENCY.time(stage="services"):
+            service_response, continue_service, status = service_manager.handle_message(user_id, request.message)
         
         if service_response:
-            # Define o response_id baseado no status
-            if status == 205:
-                response_id = "human_transfer"
-                question_id = "human_transfer_request"
-            elif status == 204:
-                response_id = "conversation_end"
-                question_id = "conversation_end"
-                # Limpa a sessão quando a conversa é finalizada
-                clear_session(user_id)
-            else:
-                response_id = "service_response"
-                question_id = "unknown_question"
-            
-            return ChatResponse(
-                response=service_response,
-                confidence=1.0 if not continue_service else 0.8,
-                response_id=response_id,
-                question_id=question_id,
-                status=status,
-                session_id=session_id
-            )
+            return service_chat_response(user_id, session_id, service_response, continue_service, status)
         
         # Se nenhum serviço respondeu, usa o ChatterBot
-        response = chatbot.get_response(request.message)
-        
-        # Obtém o ID da pergunta (statement da pergunta do usuário)
-        question_statements = list(chatbot.storage.filter(text=request.message))
-        question_id = str(question_statements[0].id) if question_statements else "unknown_question"
-        
-        # Obtém o ID da resposta
-        response_statements = list(chatbot.storage.filter(text=str(response)))
-        response_id = str(response_statements[0].id) if response_statements else "unknown_response"
-        
-        # Determina o status baseado na resposta do ChatterBot
-        status = determine_chatterbot_status(str(response))
+        # A seleção já retorna os IDs da pergunta casada e da resposta
+        return chatterbot_chat_response(user_id, session_id, responder.get_response(request.message))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def session_timeout_response() -> ChatResponse:
+    return ChatResponse(
+        response="Sua sessão expirou por inatividade. Para continuar, envie uma nova mensagem.",
+        confidence=1.0,
+        response_id="session_timeout",
+        question_id="session_timeout",
+        status=204,  # Conversa finalizada por timeout
+        session_id=""
+    )
+
+def service_chat_response(user_id: str, session_id: str, service_response: str,
+                          continue_service: bool, status: int) -> ChatResponse:
+    """
+    Monta a resposta de um serviço
+    """
+    # Define o response_id baseado no status
+    if status == 205:
+        response_id = "human_transfer"
+        question_id = "human_transfer_request"
+    elif status == 204:
+        response_id = "conversation_end"
+        question_id = "conversation_end"
+        # Limpa a sessão quando a conversa é finalizada
+        clear_session(user_id)
+    else:
+        response_id = "service_response"
+        question_id = "unknown_question"
+    
+    return ChatResponse(
+        response=service_response,
+        confidence=1.0 if not continue_service else 0.8,
+        response_id=response_id,
+        question_id=question_id,
+        status=status,
+        session_id=session_id
+    )
+
+def chatterbot_chat_response(user_id: str, session_id: str, match) -> ChatResponse:
+    """
+    Monta a resposta do ChatterBot
+    """
+    # Determina o status baseado na resposta do ChatterBot
+    status = determine_chatterbot_status(match.text)
+    
+    # Se a conversa foi finalizada, limpa a sessão
+    if status == 204:
+        clear_session(user_id)
         
-        # Se a conversa foi finalizada, limpa a sessão
-        if status == 204:
+    return ChatResponse(
+        response=match.text,
+        confidence=match.confidence,
+        response_id=match.response_id or "unknown_response",
+        question_id=match.question_id or "unknown_question",
+        status=status,
+        session_id=session_id
+    )
+
+def process_chat_batch(requests: List[ChatRequest]) -> List[ChatBatchItem]:
+    """
+    Processa um lote de mensagens (executado no pool de workers).
+
+    As mensagens são agrupadas por usuário e processadas em rodadas: cada
+    rodada pega a próxima mensagem de cada usuário, o que preserva a ordem
+    por usuário. Em cada rodada as sessões são lidas e gravadas com uma
+    única operação no backend e as mensagens sem resposta de serviço são
+    selecionadas em lote pelo ChatterBot. Falhas são informadas por item.
+    """
+    items: List[Optional[ChatBatchItem]] = [None] * len(requests)
+    positions_by_user: Dict[str, List[int]] = {}
+    for position, request in enumerate(requests):
+        positions_by_user.setdefault(request.user_id or "default_user", []).append(position)
+
+    rounds = max((len(positions) for positions in positions_by_user.values()), default=0)
+    for round_number in range(rounds):
+        positions = {
+            user_id: user_positions[round_number]
+            for user_id, user_positions in positions_by_user.items()
+            if round_number < len(user_positions)
+        }
+        try:
+            _process_batch_round(positions, requests, items)
+        except Exception as e:
+            for position in positions.values():
+                if items[position] is None:
+                    items[position] = ChatBatchItem(error=str(e))
+    return items
+
+def _process_batch_round(positions: Dict[str, int], requests: List[ChatRequest],
+                         items: List[Optional[ChatBatchItem]]):
+    """
+    Processa uma mensagem de cada usuário de `positions` (user_id -> posição no lote)
+    """
+    user_ids = list(positions)
+    with STAGE_LATENCY.time(stage="session_load"):
+        sessions = state_store.get_many([_session_key(user_id) for user_id in user_ids])
+
+    session_ids: Dict[str, str] = {}
+    touched: Dict[str, dict] = {}
+    for user_id, session in zip(user_ids, sessions):
+        if check_session_timeout(user_id, session):
             clear_session(user_id)
-            
-        return ChatResponse(
-            response=str(response),
-            confidence=float(response.confidence),
-            response_id=response_id,
-            question_id=question_id,
-            status=status,
-            session_id=session_id
-        )
+            items[positions[user_id]] = ChatBatchItem(response=session_timeout_response())
+        else:
+            session = touch_session(session)
+            touched[_session_key(user_id)] = session
+            session_ids[user_id] = session["session_id"]
+
+    with STAGE_LATENCY.time(stage="session_save"):
+        state_store.set_many(touched, ttl=SESSION_TTL_SECONDS)
+
+    # Serviços primeiro; o que nenhum serviço responder vai para o ChatterBot em lote
+    pending: List[str] = []
+    for user_id, session_id in session_ids.items():
+        position = positions[user_id]
+        try:
+            with STAGE_LATENCY.time(stage="services"):
+                service_response, continue_service, status = service_manager.handle_message(
+                    user_id, requests[position].message
+                )
+            if service_response:
+                items[position] = ChatBatchItem(response=service_chat_response(
+                    user_id, session_id, service_response, continue_service, status
+                ))
+            else:
+                pending.append(user_id)
+        except Exception as e:
+            items[position] = ChatBatchItem(error=str(e))
+
+    if not pending:
+        return
+
+    messages = [requests[positions[user_id]].message for user_id in pending]
+    try:
+        matches = responder.get_responses(messages)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logging.error(f"Erro na seleção em lote, respondendo individualmente: {str(e)}")
+        matches = [None] * len(pending)
+
+    for user_id, message, match in zip(pending, messages, matches):
+        position = positions[user_id]
+        try:
+            if match is None:
+                match = responder.get_response(message)
+            items[position] = ChatBatchItem(response=chatterbot_chat_response(
+                user_id, session_ids[user_id], match
+            ))
+        except Exception as e:
+            items[position] = ChatBatchItem(error=str(e))
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """
+    Endpoint para enviar mensagens ao chatbot e receber respostas
+    
+    Status codes:
+    - 200: Resposta normal do chatbot
+    - 204: Conversa finalizada pelo bot (timeout ou comando de saída)
+    - 205: Transferência para atendente humano
+    - 503: Servidor sobrecarregado, tente novamente após Retry-After segundos
+    """
+    ensure_started()
+    # Gera um ID de usuário se não foi fornecido
+    user_id = request.user_id or "default_user"
+
+    try:
+        with STAGE_LATENCY.time(stage="chat"):
+            response = await chat_pool.run(user_id, process_chat, user_id, request)
+        RESPONSES.inc(channel="api", status=response.status)
+        return response
+    except HTTPException as e:
+        RESPONSES.inc(channel="api", status=e.status_code)
+        raise
+    except PoolSaturated:
+        RESPONSES.inc(channel="api", status=503)
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor sobrecarregado. Tente novamente em instantes.",
+            headers={"Retry-After": str(CHAT_RETRY_AFTER_SECONDS)}
+        )
+
+@app.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(request: ChatBatchRequest):
+    """
+    Endpoint para gateways de canais enviarem várias mensagens de uma vez.
+    As respostas voltam na mesma ordem das mensagens; mensagens do mesmo
+    usuário são processadas em ordem. Uma falha em uma mensagem é informada
+    em `error` do item correspondente, sem afetar as demais.
+
+    Status codes:
+    - 200: Lote processado (ver `response` ou `error` de cada item)
+    - 413: Lote acima de CHAT_BATCH_MAX_ITEMS mensagens
+    - 503: Servidor sobrecarregado, tente novamente após Retry-After segundos
+    """
+    ensure_started()
+    if len(request.requests) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"O lote aceita no máximo {CHAT_BATCH_MAX_ITEMS} mensagens."
+        )
+
+    user_ids = [item.user_id or "default_user" for item in request.requests]
+    try:
+        with STAGE_LATENCY.time(stage="chat_batch"):
+            items = await chat_pool.run_many(user_ids, process_chat_batch, request.requests)
+    except PoolSaturated:
+        RESPONSES.inc(channel="api", status=503)
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor sobrecarregado. Tente novamente em instantes.",
+            headers={"Retry-After": str(CHAT_RETRY_AFTER_SECONDS)}
+        )
+
+    for item in items:
+        RESPONSES.inc(channel="api", status=item.response.status if item.response else 500)
+    return ChatBatchResponse(responses=items)
+
+@app.post("/telegram/webhook")
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None)
+):
+    """
+    Recebe atualizações do Telegram (TELEGRAM_MODE=webhook) e as enfileira
+    para processamento, respondendo imediatamente
+    """
+    if TELEGRAM_MODE != 'webhook':
+        raise HTTPException(status_code=404, detail="Webhook do Telegram desativado")
+    ensure_started()
+    if not telegram.verify_webhook_secret(x_telegram_bot_api_secret_token):
+        raise HTTPException(status_code=401, detail="Segredo do webhook inválido")
+
+    message = telegram.handle_webhook(await request.json())
+    if message and not enqueue_telegram_message(*message):
+        # O Telegram reenvia a atualização quando recebe erro
+        raise HTTPException(
+            status_code=503,
+            detail="Fila de mensagens cheia",
+            headers={"Retry-After": str(CHAT_RETRY_AFTER_SECONDS)}
+        )
+    return {"ok": True}
 
 @app.get("/health")
 async def health_check():
     """
     Endpoint para verificar se a API está funcionando
     """
-    return {"status": "healthy"} 
\ No newline at end of file
+    if startup_timeline.error:
+        return JSONResponse({"status": "failed", "startup": startup_timeline.report()}, status_code=500)
+    if not startup_timeline.completed:
+        return {"status": "starting", "startup": startup_timeline.report()}
+    return {
+        "status": "healthy",
+        "startup": startup_timeline.report(),
+        "state": state_store.stats(),
+        "chat_pool": chat_pool.stats(),
+        "telegram": telegram_dispatcher.stats(),
+        "telegram_sender": telegram.sender.stats(),
+        "response_cache": response_cache.stats() if response_cache else None,
+        "learning": learning_queue.stats() if learning_queue else None,
+        "nlp": chatbot.storage.tagger.stats() if hasattr(chatbot.storage.tagger, 'stats') else None,
+        "process_lookup": _process_lookup().stats() if _process_lookup() else None
+    }
+
+def _process_lookup():
+    """Consulta de processos do ProcessService, se o serviço estiver registrado"""
+    service = service_manager.services_by_name.get('ProcessService')
+    return getattr(service, 'lookup', None)
+
+def _collect_gauges():
+    """
+    Registra métricas calculadas no momento da coleta a partir dos
+    contadores já mantidos pelos componentes
+    """
+    sessions = REGISTRY.gauge("chatbot_sessions", "Sessões ativas guardadas no backend de estado (apenas memory)")
+    sessions.set_function(lambda: state_store.stats().get('keys_by_namespace', {}).get('session'))
+
+    queues = REGISTRY.gauge("chatbot_queue_depth", "Mensagens aguardando em cada fila", ["queue"])
+    queues.set_function(lambda: {
+        ("chat",): chat_pool.pending,
+        ("telegram_inbound",): telegram_dispatcher.stats()['queued'],
+        ("telegram_outbound",): telegram.sender.stats()['queued'],
+        ("learning",): learning_queue.stats()['queued'] if learning_queue else 0,
+    })
+
+    telegram_sends = REGISTRY.counter("chatbot_telegram_send_total", "Envios ao Telegram por resultado", ["result"])
+    telegram_sends.set_function(lambda: {
+        (result,): value for result, value in telegram.sender.stats().items() if result != 'queued'
+    })
+
+    if response_cache:
+        cache_lookups = REGISTRY.counter("chatbot_response_cache_lookups_total", "Consultas ao cache de respostas", ["result"])
+        cache_lookups.set_function(lambda: {
+            ("hit",): response_cache.hits,
+            ("redis_hit",): response_cache.redis_hits,
+            ("miss",): response_cache.misses,
+        })
+
+    tagger = chatbot.storage.tagger
+    if hasattr(tagger, 'stats'):
+        nlp_tokens = REGISTRY.counter("chatbot_nlp_tokens_total", "Tokens processados pelo spaCy por caminho", ["path"])
+        nlp_tokens.set_function(lambda: {
+            (path,): tagger.stats()[path]['tokens'] for path in ('serving', 'training')
+        })
+        nlp_seconds = REGISTRY.counter("chatbot_nlp_seconds_total", "Tempo de processamento do spaCy por caminho", ["path"])
+        nlp_seconds.set_function(lambda: {
+            (path,): tagger.stats()[path]['seconds'] for path in ('serving', 'training')
+        })
+
+    if learning_queue:
+        learning_events = REGISTRY.counter("chatbot_learning_events_total", "Eventos da fila de aprendizado por resultado", ["result"])
+        learning_events.set_function(lambda: {
+            ("enqueued",): learning_queue.enqueued,
+            ("written",): learning_queue.written,
+            ("dropped",): learning_queue.dropped,
+        })
+
+    lookup = _process_lookup()
+    if lookup:
+        process_lookups = REGISTRY.counter("chatbot_process_lookups_total", "Consultas de processo por origem da resposta", ["result"])
+        process_lookups.set_function(lambda: {
+            ("cache_hit",): lookup.cache_hits,
+            ("coalesced",): lookup.coalesced,
+            ("miss",): lookup.misses,
+            ("failed",): lookup.failures,
+            ("rejected",): lookup.breaker.rejected,
+        })
+
+def _check_model() -> dict:
+    """O treinamento terminou e o índice de respostas está carregado"""
+    indexes = [adapter.index for adapter in chatbot.logic_adapters if hasattr(adapter, 'index')]
+    if not all(index.loaded for index in indexes):
+        raise RuntimeError("Índice de respostas não carregado")
+    return {
+        'training_hash': chatbot.training_hash[:12],
+        'indexed_questions': sum(len(index.question_ids) for index in indexes)
+    }
+
+# Timeout (segundos) de cada verificação do /ready, abaixo do timeout do probe
+READINESS_TIMEOUT_SECONDS = float(os.getenv('READINESS_TIMEOUT_SECONDS', '1'))
+_readiness_redis = None
+
+def _check_mongo():
+    # Limita também a seleção de servidor, que por padrão aguarda até 30s
+    with pymongo.timeout(READINESS_TIMEOUT_SECONDS):
+        chatbot.storage.client.admin.command('ping')
+
+def _check_redis():
+    # Cliente próprio com timeouts curtos e sem novas tentativas, sem alterar
+    # os do cliente compartilhado
+    global _readiness_redis
+    if _readiness_redis is None:
+        _readiness_redis = create_redis_client(
+            socket_timeout=READINESS_TIMEOUT_SECONDS,
+            socket_connect_timeout=READINESS_TIMEOUT_SECONDS,
+            retry=Retry(NoBackoff(), 0)
+        )
+    _readiness_redis.ping()
+
+# Resultado das verificações reaproveitado por READINESS_CACHE_SECONDS
+readiness_checks = {'model': _check_model, 'mongodb': _check_mongo}
+if REDIS_REQUIRED:
+    readiness_checks['redis'] = _check_redis
+readiness = ReadinessChecker(
+    readiness_checks,
+    cache_seconds=float(os.getenv('READINESS_CACHE_SECONDS', '5'))
+)
+
+@app.get("/ready")
+def ready():
+    """
+    Readiness: a réplica só recebe tráfego com o modelo carregado e
+    MongoDB e Redis (quando usado) acessíveis (503 caso contrário)
+    """
+    if not startup_timeline.completed:
+        return JSONResponse({"ready": False, "startup": startup_timeline.report()}, status_code=503)
+    report = dict(readiness.check(), startup=startup_timeline.report())
+    return JSONResponse(report, status_code=200 if report['ready'] else 503)
+
+@app.get("/live")
+async def live():
+    """
+    Liveness: responde enquanto o event loop estiver atendendo, sem acessar backends.
+    Se a inicialização falhou, responde 500 para que o Kubernetes reinicie o pod
+    e a inicialização seja tentada de novo
+    """
+    if startup_timeline.error:
+        return JSONResponse({"status": "failed", "error": startup_timeline.error}, status_code=500)
+    return {"status": "alive"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Métricas no formato de texto do Prometheus
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,338 @@
+"""
+Benchmark de latência e vazão do pipeline de conversa.
+
+Simula usuários com uma mistura configurável de conversas (perguntas
+frequentes, consulta de processo e transferência para atendente) em níveis
+crescentes de concorrência, e reporta vazão e percentis p50/p95/p99.
+
+Alvos:
+    http        POST /chat de uma API em execução (--url)
+    inprocess   ServiceManager.handle_message + seleção de resposta do
+                ChatterBot no mesmo processo, com tempos por etapa
+
+Exemplos:
+    python -m benchmarks.chat_benchmark --target http --url http://localhost:8000
+    python -m benchmarks.chat_benchmark --target inprocess --mongo mongomock \\
+        --concurrency 1,4,16 --requests 500 --mix faq=0.6,process=0.3,human=0.1
+    python -m benchmarks.chat_benchmark ... --compare benchmarks/results/anterior.json
+
+Os resultados são gravados em JSON (--output, padrão benchmarks/results/)
+para comparação entre execuções.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+FAQ_QUESTIONS = [
+    "como consultar um processo?",
+    "qual o horário de atendimento?",
+    "como emitir uma certidão?",
+    "quais são os prazos processuais?",
+    "o que é o PJe?",
+    "oi",
+    "bom dia",
+    "tudo bem?",
+    "obrigado",
+    "como funciona o balcão virtual?",
+]
+
+TRIBUNALS = ["tjpr", "tjsp", "tjmg", "tjrs", "tjba"]
+
+
+def cnj_process_number(sequence: int) -> str:
+    """Número de processo CNJ (20 dígitos) com dígito verificador válido"""
+    number, year, segment, court, origin = f"{sequence % 10 ** 7:07d}", "2024", "8", "16", "0001"
+    remainder = int(f"{number}{year}{segment}{court}{origin}00") % 97
+    return f"{number}{98 - remainder:02d}{year}{segment}{court}{origin}"
+
+
+def build_conversation(kind: str, rng: random.Random) -> List[str]:
+    """Sequência de mensagens de um usuário para o tipo de conversa"""
+    if kind == "faq":
+        return [rng.choice(FAQ_QUESTIONS)]
+    if kind == "process":
+        return ["quero consultar processo", cnj_process_number(rng.randrange(10 ** 7))]
+    if kind == "human":
+        return ["quero falar com atendente", rng.choice(TRIBUNALS), "sim"]
+    raise ValueError(f"Tipo de conversa desconhecido: {kind}")
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        kind, weight = item.split("=")
+        mix[kind.strip()] = float(weight)
+    for kind in mix:
+        build_conversation(kind, random.Random(0))
+    return mix
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentil pelo método nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values: List[float]) -> dict:
+    """p50/p95/p99, média e máximo em milissegundos"""
+    ordered = sorted(values)
+    return {
+        "p50": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99": round(percentile(ordered, 0.99) * 1000, 3),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "max": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+class HttpTarget:
+    """Envia as mensagens para o /chat de uma API em execução"""
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        import requests
+
+        self.url = url.rstrip("/") + "/chat"
+        self.timeout = timeout
+        self._local = threading.local()
+        self._requests = requests
+
+    def _session(self):
+        # Uma sessão keep-alive por thread, como um cliente real
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        return session
+
+    def send(self, user_id: str, message: str) -> Tuple[int, Dict[str, float]]:
+        response = self._session().post(
+            self.url, json={"message": message, "user_id": user_id}, timeout=self.timeout
+        )
+        if response.status_code != 200:
+            return response.status_code, {}
+        return response.json().get("status", 200), {}
+
+
+class InProcessTarget:
+    """
+    Executa o mesmo caminho do /chat sem HTTP: serviços e, se nenhum
+    responder, a seleção de resposta do ChatterBot. Mede cada etapa.
+    """
+
+    def __init__(self, chatbot):
+        from logic.responder import Responder
+        from main import setup_services
+
+        self.service_manager = setup_services(chatbot)
+        self.responder = Responder(chatbot)
+
+    def send(self, user_id: str, message: str) -> Tuple[int, Dict[str, float]]:
+        stages = {}
+        start = time.perf_counter()
+        response, _, status = self.service_manager.handle_message(user_id, message)
+        stages["services"] = time.perf_counter() - start
+        if not response:
+            start = time.perf_counter()
+            self.responder.get_response(message)
+            stages["chatterbot"] = time.perf_counter() - start
+            status = 200
+        return status, stages
+
+
+def create_inprocess_bot(mongo: str):
+    """
+    Cria e treina o bot como na API. Com `mongomock`, o MongoDB é simulado
+    em memória (requer o pacote mongomock); caso contrário usa MONGO_HOST/PORT.
+    """
+    from main import create_and_train_bot
+
+    if mongo == "mongomock":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("O modo --mongo mongomock requer o pacote mongomock (pip install mongomock)")
+        host = os.getenv("MONGO_HOST", "mongodb")
+        port = int(os.getenv("MONGO_PORT", "27017"))
+        patcher = mongomock.patch(servers=((host, port),))
+        patcher.start()
+    return create_and_train_bot()
+
+
+def run_step(send: Callable, concurrency: int, total_requests: int, mix: Dict[str, float], seed: int) -> dict:
+    """
+    Executa `total_requests` mensagens com `concurrency` usuários simultâneos.
+    Cada usuário percorre conversas completas, uma mensagem de cada vez.
+    """
+    kinds, weights = zip(*mix.items())
+    latencies: List[float] = []
+    stage_latencies: Dict[str, List[float]] = {}
+    statuses: Counter = Counter()
+    errors: Counter = Counter()
+    lock = threading.Lock()
+    remaining = [total_requests]
+
+    def take() -> bool:
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def virtual_user(worker: int):
+        rng = random.Random(seed * 1000 + worker)
+        while True:
+            kind = rng.choices(kinds, weights)[0]
+            user_id = f"bench-{uuid.uuid4()}"
+            for message in build_conversation(kind, rng):
+                if not take():
+                    return
+                start = time.perf_counter()
+                try:
+                    status, stages = send(user_id, message)
+                except Exception as e:
+                    with lock:
+                        errors[type(e).__name__] += 1
+                    continue
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[str(status)] += 1
+                    for stage, value in stages.items():
+                        stage_latencies.setdefault(stage, []).append(value)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(virtual_user, range(concurrency)))
+    duration = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": dict(errors),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latency_ms": summarize(latencies),
+        "stages_ms": {stage: summarize(values) for stage, values in sorted(stage_latencies.items())},
+        "status_counts": dict(statuses),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "desconhecido"
+
+
+def print_step(step: dict):
+    latency = step["latency_ms"]
+    print(
+        f"concorrência {step['concurrency']:>4} | {step['requests']:>6} req | "
+        f"{step['throughput_rps']:>9.2f} req/s | p50 {latency['p50']:>9.3f} ms | "
+        f"p95 {latency['p95']:>9.3f} ms | p99 {latency['p99']:>9.3f} ms | erros {sum(step['errors'].values())}"
+    )
+
+
+def print_comparison(previous: dict, current: dict):
+    """Variação percentual de vazão e latência para cada concorrência presente nas duas execuções"""
+    previous_steps = {step["concurrency"]: step for step in previous["steps"]}
+    print(f"\nComparação com {previous['meta'].get('commit')} ({previous['meta'].get('timestamp')}):")
+    for step in current["steps"]:
+        before = previous_steps.get(step["concurrency"])
+        if not before:
+            continue
+
+        def delta(new, old):
+            return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+        print(
+            f"concorrência {step['concurrency']:>4} | vazão {delta(step['throughput_rps'], before['throughput_rps'])} | "
+            f"p50 {delta(step['latency_ms']['p50'], before['latency_ms']['p50'])} | "
+            f"p95 {delta(step['latency_ms']['p95'], before['latency_ms']['p95'])} | "
+            f"p99 {delta(step['latency_ms']['p99'], before['latency_ms']['p99'])}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de conversa do chatbot")
+    parser.add_argument("--target", choices=["http", "inprocess"], default="http")
+    parser.add_argument("--url", default="http://localhost:8000", help="URL base da API (alvo http)")
+    parser.add_argument("--mongo", choices=["env", "mongomock"], default="env",
+                        help="MongoDB do alvo inprocess: env (MONGO_HOST/PORT) ou mongomock (em memória)")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="Níveis de concorrência, separados por vírgula")
+    parser.add_argument("--requests", type=int, default=500, help="Mensagens por nível de concorrência")
+    parser.add_argument("--warmup", type=int, default=20, help="Mensagens de aquecimento (não medidas)")
+    parser.add_argument("--mix", default="faq=0.7,process=0.2,human=0.1",
+                        help="Peso de cada tipo de conversa: faq, process, human")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON de resultados (padrão: benchmarks/results/<data>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparação")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    mix = parse_mix(args.mix)
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    if args.target == "http":
+        send = HttpTarget(args.url).send
+    else:
+        started = time.perf_counter()
+        chatbot = create_inprocess_bot(args.mongo)
+        print(f"Bot criado e treinado em {time.perf_counter() - started:.1f}s")
+        send = InProcessTarget(chatbot).send
+
+    if args.warmup:
+        run_step(send, 1, args.warmup, mix, args.seed)
+
+    steps = []
+    for concurrency in levels:
+        step = run_step(send, concurrency, args.requests, mix, args.seed)
+        print_step(step)
+        steps.append(step)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "target": args.target,
+            "url": args.url if args.target == "http" else None,
+            "mongo": args.mongo if args.target == "inprocess" else None,
+            "retrieval_engine": os.getenv("RETRIEVAL_ENGINE", "vector"),
+            "mix": mix,
+            "requests_per_step": args.requests,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "steps": steps,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{args.target}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"\nResultados gravados em {output}")
+
+    if args.compare:
+        print_comparison(json.loads(Path(args.compare).read_text()), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import logging
+import re
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec(NamedTuple):
+    """Índice declarado para a coleção de statements"""
+    name: str
+    keys: List[Tuple[str, int]]
+
+
+class HotQuery(NamedTuple):
+    """Consulta frequente cujo plano de execução é verificado com explain()"""
+    name: str
+    filter: dict
+    sort: Optional[List[Tuple[str, int]]] = None
+
+
+class IndexCheckError(Exception):
+    """Levantada quando alguma consulta frequente faz varredura completa da coleção"""
+    pass
+
+
+# Índices exigidos pelas consultas do ChatterBot (MongoDatabaseAdapter.filter,
+# BestMatch e learn_response) e pelo pipeline de treinamento
+STATEMENT_INDEXES = [
+    # filter(text=...) e o upsert do BulkListTrainer (text, in_response_to, conversation)
+    IndexSpec('text_in_response_to_conversation', [('text', 1), ('in_response_to', 1), ('conversation', 1)]),
+    # BestMatch: candidatos por search_text e respostas por search_in_response_to
+    IndexSpec('search_text', [('search_text', 1)]),
+    IndexSpec('search_in_response_to', [('search_in_response_to', 1)]),
+    # Última resposta da conversa (learn_response) e limpeza de CSVs retreinados
+    IndexSpec('conversation_tags', [('conversation', 1), ('tags', 1)]),
+]
+
+# O valor dos filtros não importa para o plano, apenas os campos consultados
+_BOT_PERSONA = {'$not': re.compile('^bot:*')}
+HOT_QUERIES = [
+    HotQuery('filter_by_text', {'text': 'consulta'}),
+    HotQuery('training_upsert', {'text': 'consulta', 'in_response_to': 'consulta', 'conversation': 'training'}),
+    HotQuery('best_match_candidates', {'search_text': re.compile('consulta'), 'persona': _BOT_PERSONA}),
+    HotQuery('best_match_responses', {'search_in_response_to': 'consulta', 'persona': _BOT_PERSONA}),
+    HotQuery('latest_conversation_response', {'conversation': 'consulta'}, sort=[('id', 1)]),
+    HotQuery('training_csv_cleanup', {'conversation': 'training', 'tags': 'csv:consulta'}),
+]
+
+
+def ensure_indexes(collection, specs: List[IndexSpec] = STATEMENT_INDEXES) -> List[str]:
+    """
+    Cria os índices declarados que ainda não existem; retorna os nomes criados.
+    Um índice já existente com as mesmas chaves (mesmo com outro nome) é mantido,
+    então a função pode ser chamada a cada inicialização.
+    """
+    existing = {tuple(tuple(key) for key in info['key']) for info in collection.index_information().values()}
+    created = []
+    for spec in specs:
+        if tuple(spec.keys) in existing:
+            continue
+        collection.create_index(spec.keys, name=spec.name, background=True)
+        created.append(spec.name)
+        logger.info(f"Índice {spec.name} criado em {collection.name}")
+    return created
+
+
+def plan_stages(plan: dict) -> Set[str]:
+    """Estágios de um plano do explain(), percorrendo os estágios de entrada"""
+    stages = set()
+    pending = [plan]
+    while pending:
+        stage = pending.pop()
+        if not isinstance(stage, dict):
+            continue
+        if 'stage' in stage:
+            stages.add(stage['stage'])
+        # O formato muda conforme a versão do servidor (queryPlan no motor SBE)
+        for key in ('inputStage', 'queryPlan', 'outerStage', 'innerStage'):
+            if key in stage:
+                pending.append(stage[key])
+        pending.extend(stage.get('inputStages', []))
+    return stages
+
+
+def explain_queries(collection, queries: List[HotQuery] = HOT_QUERIES) -> List[dict]:
+    """Executa explain() de cada consulta e retorna os estágios do plano vencedor"""
+    report = []
+    for query in queries:
+        cursor = collection.find(query.filter)
+        if query.sort:
+            cursor = cursor.sort(query.sort)
+        try:
+            stages = plan_stages(cursor.explain()['queryPlanner']['winningPlan'])
+        except Exception as e:
+            report.append({'query': query.name, 'stages': [], 'collscan': None, 'error': str(e)})
+            continue
+        report.append({'query': query.name, 'stages': sorted(stages), 'collscan': 'COLLSCAN' in stages})
+    return report
+
+
+def check_statement_indexes(storage, mode: str = 'warn') -> Dict[str, list]:
+    """
+    Garante os índices da coleção de statements e verifica o plano das consultas
+    frequentes. Com `mode='fail'`, levanta IndexCheckError se alguma fizer
+    COLLSCAN; com `warn`, apenas registra um aviso; com `off`, não verifica.
+    """
+    if mode not in ('off', 'warn', 'fail'):
+        raise ValueError(f"MONGO_INDEX_CHECK inválido: {mode}")
+
+    collection = storage.statements
+    created = ensure_indexes(collection)
+    if mode == 'off':
+        return {'created': created, 'queries': []}
+
+    report = explain_queries(collection)
+    collscans = [item['query'] for item in report if item['collscan']]
+    for item in report:
+        if item.get('error'):
+            logger.warning(f"Não foi possível obter o plano de {item['query']}: {item['error']}")
+    if collscans:
+        message = f"Consultas com COLLSCAN na coleção {collection.name}: {', '.join(collscans)}"
+        if mode == 'fail':
+            raise IndexCheckError(message)
+        logger.warning(message)
+    return {'created': created, 'queries': report}
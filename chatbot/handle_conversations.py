@@ -1,50 +1,117 @@
 import csv
+import hashlib
+import logging
 import os
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-def read_conversations_from_csv(file_path):
+# Diretório com os arquivos CSV de conversas usados no treinamento
+CONVERSATIONS_DIR = Path("conversations/csv")
+
+logger = logging.getLogger(__name__)
+
+def iter_conversations_from_csv(file_path, errors: Optional[list] = None) -> Iterator[Tuple[str, str]]:
     """
-    Lê conversas de um arquivo CSV.
+    Percorre as conversas de um arquivo CSV, uma linha por vez.
     O arquivo deve ter duas colunas: pergunta e resposta.
-    Usa ponto e vírgula (;) como separador.
+    Usa tabulação como separador.
+
+    Problemas de leitura são registrados no log com o arquivo e a linha e,
+    se `errors` for informado, acrescentados a ele como (arquivo, linha, mensagem).
+    Uma linha malformada é ignorada sem interromper o restante do arquivo, e bytes
+    inválidos em UTF-8 são substituídos por "\ufffd", de modo que o arquivo é
+    sempre lido até o fim e pode ser registrado como treinado no manifesto.
     """
-    conversations = []
+    file_path = Path(file_path)
+
+    def report(line, message):
+        logger.warning(f"Erro ao ler {file_path.name}, linha {line}: {message}")
+        if errors is not None:
+            errors.append((file_path.name, line, message))
+
     try:
-        with open(file_path, 'r', encoding='utf-8') as csvfile:
+        with open(file_path, 'r', encoding='utf-8', errors='replace', newline='') as csvfile:
             reader = csv.reader(csvfile, delimiter='\t')
-            next(reader)  # Pula o cabeçalho
-            for row in reader:
-                if len(row) >= 2:  # Verifica se tem pelo menos duas colunas
-                    question, answer = row[0], row[1]
-                    conversations.append((question, answer))
-    except Exception as e:
-        print(f"Erro ao ler o arquivo {file_path}: {str(e)}")
-    return conversations
-
-def get_all_conversations():
-    """
-    Retorna todas as conversas em um formato plano para treinamento,
-    lendo todos os arquivos CSV da pasta conversations/csv/
-    """
-    all_conversations = []
-    csv_dir = Path("conversations/csv")
-    
-    # Garante que o diretório existe
+            header = True  # A primeira linha é o cabeçalho, mesmo se estiver malformada
+            while True:
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    break
+                except csv.Error as e:
+                    report(reader.line_num, str(e))
+                    header = False
+                    continue
+                if header:
+                    header = False
+                    continue
+                if any('\ufffd' in cell for cell in row):
+                    report(reader.line_num, "bytes inválidos em UTF-8 substituídos")
+                if len(row) >= 2 and row[0].strip() and row[1].strip():
+                    yield row[0], row[1]
+                elif any(cell.strip() for cell in row):
+                    report(reader.line_num, f"esperadas 2 colunas (pergunta e resposta), encontradas {len(row)}")
+    except OSError as e:
+        report(0, str(e))
+
+def _file_sha256(file_path: Path) -> str:
+    """Calcula o SHA-256 do conteúdo de um arquivo"""
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def build_manifest(csv_dir: Path = CONVERSATIONS_DIR, previous: Optional[Dict[str, dict]] = None) -> Dict[str, dict]:
+    """
+    Monta o manifesto dos arquivos CSV: nome -> {mtime, size, sha256}.
+    O SHA-256 de um arquivo só é recalculado se mtime ou tamanho mudaram
+    em relação ao manifesto anterior.
+    """
+    previous = previous or {}
+    csv_dir = Path(csv_dir)
     csv_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Lista todos os arquivos CSV no diretório
-    csv_files = list(csv_dir.glob("*.csv"))
-    
-    if not csv_files:
-        print("Aviso: Nenhum arquivo CSV encontrado em conversations/csv/")
-        return all_conversations
-    
-    # Lê cada arquivo CSV encontrado
+
+    manifest = {}
+    for csv_file in sorted(csv_dir.glob("*.csv")):
+        stat = os.stat(csv_file)
+        entry = {'mtime': stat.st_mtime, 'size': stat.st_size}
+        known = previous.get(csv_file.name)
+        if known and known.get('mtime') == entry['mtime'] and known.get('size') == entry['size']:
+            entry['sha256'] = known['sha256']
+        else:
+            entry['sha256'] = _file_sha256(csv_file)
+        manifest[csv_file.name] = entry
+    return manifest
+
+def diff_manifest(previous: Dict[str, dict], current: Dict[str, dict]) -> Tuple[List[str], List[str]]:
+    """
+    Compara dois manifestos pelo conteúdo dos arquivos.
+    Retorna (arquivos novos ou alterados, arquivos removidos)
+    """
+    changed = [
+        name for name, entry in current.items()
+        if previous.get(name, {}).get('sha256') != entry['sha256']
+    ]
+    removed = [name for name in previous if name not in current]
+    return changed, removed
+
+def iter_conversation_pairs(file_names: Optional[Iterable[str]] = None, csv_dir: Path = CONVERSATIONS_DIR,
+                            errors: Optional[list] = None):
+    """
+    Percorre os pares (pergunta, resposta) dos arquivos CSV da pasta
+    conversations/csv/, um arquivo por vez, sem carregar o corpus em memória.
+    Se `file_names` for informado, lê apenas esses arquivos. Os problemas de
+    leitura são acrescentados a `errors`, se informado.
+    """
+    csv_dir = Path(csv_dir)
+    csv_dir.mkdir(parents=True, exist_ok=True)
+
+    if file_names is None:
+        csv_files = sorted(csv_dir.glob("*.csv"))
+    else:
+        csv_files = [csv_dir / name for name in file_names]
+
     for csv_file in csv_files:
-        print(f"Lendo arquivo: {csv_file.name}")
-        conversations = read_conversations_from_csv(csv_file)
-        for question, answer in conversations:
-            all_conversations.append(question)
-            all_conversations.append(answer)
-    
-    return all_conversations 
\ No newline at end of file
+        logger.info(f"Lendo arquivo: {csv_file.name}")
+        yield from iter_conversations_from_csv(csv_file, errors)
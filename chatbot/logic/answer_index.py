@@ -0,0 +1,274 @@
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza o texto: minúsculas, sem acentos e sem pontuação"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+class AnswerIndex:
+    """
+    Índice vetorial em memória das perguntas conhecidas pelo chatbot.
+
+    Cada pergunta (statement que possui ao menos uma resposta) é representada
+    por um vetor TF-IDF de n-gramas de caracteres e palavras, com hashing em
+    `n_features` posições. A matriz é guardada no formato coluna-esparsa
+    (feature -> lista de perguntas) para que uma consulta seja resolvida com
+    um único `np.bincount` sobre as colunas tocadas pela entrada.
+    """
+
+    def __init__(self, n_features: int = 2 ** 20, ngram_size: int = 3):
+        self.n_features = n_features
+        self.ngram_size = ngram_size
+
+        self.question_ids: List[str] = []
+        self.question_texts: List[str] = []
+        self.responses: List[List[Tuple[str, str]]] = []
+
+        # Matriz esparsa em formato CSC (colunas = features)
+        self.feature_keys = np.zeros(0, dtype=np.uint32)
+        self.feature_idf = np.zeros(0, dtype=np.float32)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.rows = np.zeros(0, dtype=np.int32)
+        self.values = np.zeros(0, dtype=np.float32)
+
+        self.loaded = False
+        # Statements lidos na construção, para detectar novos statements aprendidos
+        self.statement_count: Optional[int] = None
+
+    # Arrays gravados em .npy e abertos com memory-map por `load`
+    ARRAYS = ('feature_keys', 'feature_idf', 'indptr', 'rows', 'values')
+
+    def __len__(self) -> int:
+        return len(self.question_texts)
+
+    def _features(self, text: str) -> Dict[int, int]:
+        """Extrai as features (hash -> contagem) de um texto"""
+        normalized = normalize_text(text)
+        counts: Dict[int, int] = {}
+        if not normalized:
+            return counts
+
+        grams = normalized.split()
+        for word in normalized.split():
+            padded = f' {word} '
+            grams.extend(
+                padded[start:start + self.ngram_size]
+                for start in range(max(1, len(padded) - self.ngram_size + 1))
+            )
+
+        for gram in grams:
+            key = zlib.crc32(gram.encode('utf-8')) % self.n_features
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def build(self, statements: Iterable[dict]) -> 'AnswerIndex':
+        """
+        Constrói o índice a partir de documentos de statements
+        (dicionários com `id`, `text`, `in_response_to` e `persona`)
+        """
+        first_id: Dict[str, str] = {}
+        responses: Dict[str, List[Tuple[str, str]]] = {}
+
+        statement_count = 0
+        for statement in statements:
+            statement_count += 1
+            text = statement.get('text')
+            if not text:
+                continue
+            if not (statement.get('persona') or '').startswith('bot:'):
+                first_id.setdefault(text, str(statement.get('id')))
+            in_response_to = statement.get('in_response_to')
+            if in_response_to:
+                responses.setdefault(in_response_to, []).append((str(statement.get('id')), text))
+
+        # Só perguntas com resposta conhecida são candidatas
+        self.question_texts = [text for text in first_id if text in responses]
+        self.question_ids = [first_id[text] for text in self.question_texts]
+        self.responses = [responses[text] for text in self.question_texts]
+
+        rows, keys, counts = [], [], []
+        for row, text in enumerate(self.question_texts):
+            for key, count in self._features(text).items():
+                rows.append(row)
+                keys.append(key)
+                counts.append(count)
+
+        rows = np.asarray(rows, dtype=np.int32)
+        keys = np.asarray(keys, dtype=np.uint32)
+        tf = 1.0 + np.log(np.asarray(counts, dtype=np.float32))
+
+        # Ordena por feature para montar as colunas
+        order = np.argsort(keys, kind='stable')
+        rows, keys, tf = rows[order], keys[order], tf[order]
+        self.feature_keys, starts, document_frequency = np.unique(keys, return_index=True, return_counts=True)
+        self.indptr = np.append(starts, len(keys)).astype(np.int64)
+
+        total = len(self.question_texts)
+        self.feature_idf = (np.log((1.0 + total) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        values = tf * np.repeat(self.feature_idf, document_frequency)
+
+        # Normalização L2 por pergunta
+        norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=total))
+        norms[norms == 0] = 1.0
+        self.rows = rows
+        self.values = (values / norms[rows]).astype(np.float32)
+
+        self.statement_count = statement_count
+        self.loaded = True
+        logger.info(f"Índice de respostas construído com {total} perguntas e {len(self.feature_keys)} features")
+        return self
+
+    def save(self, directory: Path):
+        """
+        Grava o índice em `directory`. A gravação é feita em um diretório
+        temporário renomeado no final, então leitores nunca veem um índice
+        incompleto; se outro processo gravou primeiro, mantém o dele.
+        """
+        directory = Path(directory)
+        temporary = directory.with_name(f"{directory.name}.tmp-{os.getpid()}")
+        temporary.mkdir(parents=True, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(temporary / f"{name}.npy", getattr(self, name))
+        with open(temporary / "questions.json", "w", encoding="utf-8") as f:
+            json.dump({
+                'n_features': self.n_features,
+                'ngram_size': self.ngram_size,
+                'question_ids': self.question_ids,
+                'question_texts': self.question_texts,
+                'responses': self.responses,
+                'statement_count': self.statement_count,
+            }, f, ensure_ascii=False)
+        try:
+            os.rename(temporary, directory)
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> 'AnswerIndex':
+        """
+        Carrega um índice gravado por `save`. Com `mmap`, os arrays são
+        mapeados do arquivo em modo somente leitura e as páginas são
+        compartilhadas entre os processos que abrem o mesmo índice.
+        """
+        directory = Path(directory)
+        with open(directory / "questions.json", encoding="utf-8") as f:
+            questions = json.load(f)
+        index = cls(n_features=questions['n_features'], ngram_size=questions['ngram_size'])
+        index.question_ids = questions['question_ids']
+        index.question_texts = questions['question_texts']
+        index.responses = [[tuple(response) for response in responses] for responses in questions['responses']]
+        index.statement_count = questions.get('statement_count')
+        for name in cls.ARRAYS:
+            setattr(index, name, np.load(directory / f"{name}.npy", mmap_mode='r' if mmap else None))
+        index.loaded = True
+        logger.info(f"Índice de respostas carregado de {directory} com {len(index)} perguntas")
+        return index
+
+    def _vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna as colunas conhecidas e os pesos normalizados da consulta"""
+        counts = self._features(text)
+        if not counts or not len(self.feature_keys):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        keys = np.fromiter(counts.keys(), dtype=np.uint32, count=len(counts))
+        tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+
+        columns = np.searchsorted(self.feature_keys, keys)
+        columns[columns == len(self.feature_keys)] = 0
+        known = self.feature_keys[columns] == keys
+        columns = columns[known]
+        weights = tf[known] * self.feature_idf[columns]
+
+        norm = math.sqrt(float(np.dot(weights, weights)))
+        if norm:
+            weights = weights / norm
+        return columns, weights
+
+    def _postings(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Posições das entradas das colunas tocadas pela consulta e o peso de cada uma"""
+        columns, weights = self._vectorize(text)
+        starts = self.indptr[columns]
+        lengths = self.indptr[columns + 1] - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return positions, np.repeat(weights, lengths)
+
+    def scores(self, text: str) -> np.ndarray:
+        """Similaridade de cosseno entre o texto e todas as perguntas do índice"""
+        positions, weights = self._postings(text)
+        if not len(positions):
+            return np.zeros(len(self), dtype=np.float32)
+
+        return np.bincount(
+            self.rows[positions],
+            weights=self.values[positions] * weights,
+            minlength=len(self)
+        )
+
+    def scores_many(self, texts: List[str]) -> np.ndarray:
+        """
+        Similaridades de várias consultas de uma vez, uma linha por texto.
+        As entradas de todas as consultas são somadas em um único `bincount`.
+        """
+        size = len(self)
+        all_cells, all_weights = [], []
+        for query, text in enumerate(texts):
+            positions, weights = self._postings(text)
+            all_cells.append(query * size + self.rows[positions].astype(np.int64))
+            all_weights.append(self.values[positions] * weights)
+
+        if not texts:
+            return np.zeros((0, size), dtype=np.float32)
+        return np.bincount(
+            np.concatenate(all_cells),
+            weights=np.concatenate(all_weights),
+            minlength=len(texts) * size
+        ).reshape(len(texts), size)
+
+    @staticmethod
+    def _top(scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        top_k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(position), float(scores[position])) for position in candidates if scores[position] > 0]
+
+    def search(self, text: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Retorna até `top_k` pares (posição, similaridade) ordenados
+        da pergunta mais similar para a menos similar
+        """
+        if not len(self):
+            return []
+        return self._top(self.scores(text), top_k)
+
+    def search_many(self, texts: List[str], top_k: int = 10) -> List[List[Tuple[int, float]]]:
+        """Mesmo resultado de `search` para cada texto, calculado em lote"""
+        if not len(self):
+            return [[] for _ in texts]
+        return [self._top(scores, top_k) for scores in self.scores_many(texts)]
+
+    def question(self, position: int) -> Tuple[str, str]:
+        """Retorna (id, texto) da pergunta na posição informada"""
+        return self.question_ids[position], self.question_texts[position]
+
+    def first_response(self, position: int) -> Optional[Tuple[str, str]]:
+        """Retorna (id, texto) da primeira resposta conhecida para a pergunta"""
+        responses = self.responses[position]
+        return responses[0] if responses else None
@@ -0,0 +1,172 @@
+import logging
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+from chatterbot.conversation import Statement
+
+from monitoring.metrics import STAGE_LATENCY
+from workers.learning_queue import LearningEvent
+
+logger = logging.getLogger(__name__)
+
+
+class MatchResult(NamedTuple):
+    """Resposta escolhida para uma mensagem, com os IDs dos statements envolvidos"""
+    text: str
+    confidence: float
+    response_id: Optional[str]
+    question_id: Optional[str]
+    question_text: Optional[str]
+
+
+class Responder:
+    """
+    Seleciona a resposta do ChatterBot para uma mensagem e retorna, em um único
+    resultado, a pergunta casada e a resposta escolhida com seus IDs.
+
+    Segue o mesmo fluxo de `ChatBot.get_response` (pré-processadores, adapters
+    de lógica e aprendizado quando o bot não é somente leitura), mas preserva o
+    statement retornado pelo adapter, que o ChatterBot descarta ao montar a
+    resposta. Assim a API não precisa buscar os IDs no MongoDB pelo texto.
+
+    Com um `cache` (ver `response_cache.py`), a seleção de perguntas repetidas
+    é reaproveitada; o aprendizado continua sendo gravado a cada mensagem. A
+    versão do cache acompanha o índice vetorial: quando ele é reconstruído com
+    statements aprendidos, as respostas em cache são invalidadas. Sem índice
+    (BestMatch), o aprendizado síncrono muda as respostas a cada mensagem, e
+    o cache é desativado.
+
+    Com uma `learning_queue` (ver `workers/learning_queue.py`), o aprendizado
+    é apenas enfileirado e gravado em segundo plano, sem escrita no MongoDB
+    durante a requisição.
+    """
+
+    def __init__(self, chatbot, cache=None, learning_queue=None):
+        self.chatbot = chatbot
+        self.cache = cache
+        self.learning_queue = learning_queue
+
+        if cache is not None:
+            indexed = [adapter for adapter in chatbot.logic_adapters if hasattr(adapter, 'add_refresh_listener')]
+            if indexed:
+                for adapter in indexed:
+                    self._sync_cache_version(adapter.index)
+                    adapter.add_refresh_listener(self._sync_cache_version)
+            elif not chatbot.read_only and learning_queue is None:
+                logger.info("Cache de respostas desativado: BestMatch com aprendizado síncrono")
+                self.cache = None
+
+    def _sync_cache_version(self, index):
+        """Versão do cache: treinamento e número de statements do índice atual"""
+        self.cache.set_version(f"{self.chatbot.training_hash}:{index.statement_count}")
+
+    def _select(self, input_statement: Statement) -> MatchResult:
+        """Consulta os adapters de lógica e retorna a saída de maior confiança"""
+        result = None
+        for adapter in self.chatbot.logic_adapters:
+            if adapter.can_process(input_statement):
+                output = adapter.process(input_statement)
+                if result is None or output.confidence > result.confidence:
+                    result = output
+        return self._match_result(result)
+
+    def _select_many(self, input_statements: List[Statement]) -> List[MatchResult]:
+        """
+        Seleciona as respostas de várias mensagens. Com um único adapter que
+        aceita lotes (VectorBestMatch), a busca no índice é feita de uma vez
+        """
+        adapters = self.chatbot.logic_adapters
+        if len(adapters) == 1 and hasattr(adapters[0], 'process_many'):
+            return [self._match_result(output) for output in adapters[0].process_many(input_statements)]
+        return [self._select(input_statement) for input_statement in input_statements]
+
+    @staticmethod
+    def _match_result(result: Statement) -> MatchResult:
+        # VectorBestMatch informa a pergunta casada; o BestMatch apenas o texto
+        question_id = getattr(result, 'question_id', None)
+        return MatchResult(
+            text=result.text,
+            confidence=float(result.confidence),
+            response_id=str(result.id) if result.id is not None else None,
+            question_id=str(question_id) if question_id is not None else None,
+            question_text=result.in_response_to
+        )
+
+    def _prepare(self, text: str) -> Tuple[Statement, Optional[MatchResult]]:
+        """Aplica os pré-processadores e consulta o cache; retorna (statement, match ou None)"""
+        input_statement = Statement(text=text)
+        for preprocessor in self.chatbot.preprocessors:
+            input_statement = preprocessor(input_statement)
+
+        # Perguntas repetidas reaproveitam a seleção, sem consultar o índice ou o MongoDB
+        match = self.cache.get(input_statement.text) if self.cache else None
+        # search_text é usado pela seleção (BestMatch) e pelo aprendizado síncrono
+        if match is None or (not self.chatbot.read_only and self.learning_queue is None):
+            input_statement.search_text = self._search_text(input_statement.text)
+        return input_statement, match
+
+    def _search_text(self, text: str) -> str:
+        """Usa o caminho de atendimento do tagger (memorizado) quando disponível"""
+        tagger = self.chatbot.storage.tagger
+        if hasattr(tagger, 'get_search_text'):
+            return tagger.get_search_text(text)
+        return tagger.get_text_index_string(text)
+
+    def get_response(self, text: str) -> MatchResult:
+        input_statement, match = self._prepare(text)
+        if match is None:
+            with STAGE_LATENCY.time(stage="selection"):
+                match = self._select(input_statement)
+            if self.cache:
+                self.cache.put(input_statement.text, match)
+        return self._learn(input_statement, match)
+
+    def get_responses(self, texts: List[str]) -> List[MatchResult]:
+        """
+        Mesmo resultado de `get_response` para várias mensagens, na mesma ordem.
+        As mensagens fora do cache são selecionadas em um único lote
+        """
+        prepared = [self._prepare(text) for text in texts]
+        misses = [position for position, (_, match) in enumerate(prepared) if match is None]
+        if misses:
+            with STAGE_LATENCY.time(stage="selection"):
+                selected = self._select_many([prepared[position][0] for position in misses])
+            for position, match in zip(misses, selected):
+                prepared[position] = (prepared[position][0], match)
+                if self.cache:
+                    self.cache.put(prepared[position][0].text, match)
+        return [self._learn(input_statement, match) for input_statement, match in prepared]
+
+    def _learn(self, input_statement: Statement, match: MatchResult) -> MatchResult:
+        """
+        Enfileira o aprendizado ou, sem fila, grava a mensagem e a resposta
+        quando o bot não é somente leitura
+        """
+        if self.learning_queue is not None:
+            self.learning_queue.put(LearningEvent(
+                text=input_statement.text,
+                response=match.text,
+                conversation=input_statement.conversation,
+                persona='bot:' + self.chatbot.name,
+                created_at=time.time()
+            ))
+            return match
+
+        storage = self.chatbot.storage
+        if not self.chatbot.read_only:
+            response = Statement(
+                text=match.text,
+                in_response_to=input_statement.text,
+                conversation=input_statement.conversation,
+                persona='bot:' + self.chatbot.name
+            )
+            with STAGE_LATENCY.time(stage="learning"):
+                learned = self.chatbot.learn_response(input_statement)
+                created = storage.create(**response.serialize())
+            # Sem statement casado (ex.: resposta padrão), usa os recém-gravados
+            match = match._replace(
+                question_id=match.question_id or str(learned.id),
+                response_id=match.response_id or str(created.id)
+            )
+
+        return match
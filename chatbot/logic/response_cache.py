@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .answer_index import normalize_text
+from .responder import MatchResult
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Cache das respostas selecionadas para perguntas repetidas.
+
+    A chave é o texto normalizado (minúsculas, sem acentos e pontuação)
+    prefixado pela versão das respostas (hash do snapshot e, com o índice
+    vetorial, o número de statements indexados), de modo que um novo
+    treinamento ou uma reconstrução do índice invalida todas as entradas
+    (`set_version`). Há um nível local (LRU com TTL) e, opcionalmente, um
+    nível Redis compartilhado entre réplicas.
+    """
+
+    def __init__(self, version: str, max_entries: int = 10000, ttl: int = 3600,
+                 redis_client=None, prefix: str = "cnj-chatbot:responses:"):
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis_client = redis_client
+        self.prefix = prefix
+        # chave -> (MatchResult, expira_em)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> Optional[str]:
+        normalized = normalize_text(text)
+        return f"{self.version}:{normalized}" if normalized else None
+
+    def get(self, text: str) -> Optional[MatchResult]:
+        key = self._key(text)
+        if key is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.redis_client is not None:
+            try:
+                raw = self.redis_client.get(self.prefix + key)
+            except Exception as e:
+                logger.warning(f"Cache de respostas no Redis indisponível: {str(e)}")
+                raw = None
+            if raw is not None:
+                result = MatchResult(*json.loads(raw))
+                self._store_local(key, result)
+                with self._lock:
+                    self.redis_hits += 1
+                return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store_local(self, key: str, result: MatchResult):
+        with self._lock:
+            self._entries[key] = (result, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, text: str, result: MatchResult):
+        key = self._key(text)
+        if key is None:
+            return
+
+        self._store_local(key, result)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(self.prefix + key, json.dumps(list(result)), ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Cache de respostas no Redis indisponível: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def set_version(self, version: str):
+        """Troca a versão das respostas; as entradas da versão anterior deixam de valer"""
+        with self._lock:
+            if version == self.version:
+                return
+            self.version = version
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                'version': self.version[:12],
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def create_response_cache(version: str, redis_client=None) -> Optional[ResponseCache]:
+    """
+    Cria o cache de respostas configurado por RESPONSE_CACHE_SIZE (0 desativa),
+    RESPONSE_CACHE_TTL_SECONDS e RESPONSE_CACHE_REDIS (usa `redis_client`
+    como segundo nível compartilhado)
+    """
+    max_entries = int(os.getenv('RESPONSE_CACHE_SIZE', '10000'))
+    if max_entries <= 0:
+        return None
+    use_redis = os.getenv('RESPONSE_CACHE_REDIS', 'false').lower() == 'true'
+    return ResponseCache(
+        version,
+        max_entries=max_entries,
+        ttl=int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '3600')),
+        redis_client=redis_client if use_redis else None
+    )
@@ -0,0 +1,195 @@
+import logging
+import shutil
+import threading
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from chatterbot.conversation import Statement
+from chatterbot.logic import LogicAdapter
+
+from .answer_index import AnswerIndex
+
+logger = logging.getLogger(__name__)
+
+# Prefixo dos subdiretórios do índice em `index_dir`; só eles são removidos na limpeza
+INDEX_PREFIX = "answer-index-"
+
+
+def iter_statement_documents(storage) -> Iterator[dict]:
+    """
+    Percorre os statements do storage como dicionários simples.
+    No MongoDB usa um único cursor com projeção em vez da paginação
+    com skip/limit do `storage.filter`.
+    """
+    if hasattr(storage, 'statements'):
+        projection = {'text': 1, 'in_response_to': 1, 'persona': 1}
+        for document in storage.statements.find({}, projection):
+            document['id'] = document.pop('_id')
+            yield document
+    else:
+        for statement in storage.filter():
+            yield {
+                'id': statement.id,
+                'text': statement.text,
+                'in_response_to': statement.in_response_to,
+                'persona': statement.persona,
+            }
+
+
+class VectorBestMatch(LogicAdapter):
+    """
+    Substituto do BestMatch que responde a partir de um índice vetorial em memória.
+
+    O índice é construído uma vez (após o treinamento) e cada consulta faz uma
+    única multiplicação esparsa contra todas as perguntas conhecidas, seguida de
+    seleção top-k. Os candidatos são reordenados com a mesma função de comparação
+    do BestMatch, de modo que `maximum_similarity_threshold` e `default_response`
+    mantêm o comportamento atual.
+
+    Statements aprendidos depois da construção (LEARNING_MODE sync, queue ou o
+    learn-worker) entram no índice pela recarga periódica (`start_refresher`):
+    quando o número de statements no storage muda, o índice é reconstruído em
+    segundo plano e substituído atomicamente.
+
+    :param top_k: Quantidade de candidatos reordenados por consulta. Padrão: 10
+    :param index_dir: Diretório onde o índice é gravado por versão do treinamento
+        (`answer-index-<versão>`) e reaberto com memory-map (compartilhado entre
+        workers). Mantém a versão atual e a anterior. Padrão: None
+    """
+
+    def __init__(self, chatbot, **kwargs):
+        super().__init__(chatbot, **kwargs)
+        self.top_k = kwargs.get('top_k', 10)
+        self.index_dir = kwargs.get('index_dir')
+        self.compare_statements = self.search_algorithm.compare_statements
+        self.index = AnswerIndex()
+        self.refreshes = 0
+        self._refresh_listeners = []
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def build_index(self, version: Optional[str] = None):
+        """
+        (Re)constrói o índice a partir do storage e troca a referência atomicamente.
+        Com `index_dir` e a versão do treinamento, reaproveita o índice já gravado
+        para essa versão (por outro worker, por exemplo) em vez de reconstruí-lo.
+        """
+        if not (self.index_dir and version):
+            self.index = AnswerIndex().build(iter_statement_documents(self.chatbot.storage))
+            return
+
+        path = Path(self.index_dir) / f"{INDEX_PREFIX}{version}"
+        if not path.exists():
+            AnswerIndex().build(iter_statement_documents(self.chatbot.storage)).save(path)
+            self._remove_old_indexes(path)
+        self.index = AnswerIndex.load(path)
+
+    @staticmethod
+    def _remove_old_indexes(current: Path, keep: int = 1):
+        """
+        Remove os índices de versões antigas, preservando `current` e as `keep`
+        versões mais recentes (um worker ainda pode estar usando a anterior).
+        Só considera diretórios `answer-index-*` completos; outros arquivos de
+        `index_dir` e gravações em andamento (`.tmp-`) não são tocados.
+        """
+        previous = sorted(
+            (
+                entry for entry in current.parent.iterdir()
+                if entry != current and entry.is_dir()
+                and entry.name.startswith(INDEX_PREFIX) and ".tmp-" not in entry.name
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True
+        )
+        for entry in previous[keep:]:
+            logger.info(f"Removendo índice de respostas antigo: {entry.name}")
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def refresh_if_changed(self) -> bool:
+        """
+        Reconstrói o índice em memória se o número de statements mudou desde a
+        construção (statements aprendidos); retorna True se reconstruiu
+        """
+        if self.chatbot.storage.count() == self.index.statement_count:
+            return False
+        self.index = AnswerIndex().build(iter_statement_documents(self.chatbot.storage))
+        self.refreshes += 1
+        for listener in self._refresh_listeners:
+            listener(self.index)
+        return True
+
+    def add_refresh_listener(self, listener):
+        """Registra uma função chamada com o novo índice a cada reconstrução"""
+        self._refresh_listeners.append(listener)
+
+    def start_refresher(self, interval: float = 30.0):
+        """Verifica o storage a cada `interval` segundos em uma thread daemon"""
+        if self._refresher is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh_if_changed()
+                except Exception as e:
+                    logger.error(f"Erro ao recarregar o índice de respostas: {str(e)}")
+
+        self._refresher = threading.Thread(target=run, name="answer-index-refresh", daemon=True)
+        self._refresher.start()
+
+    def stop_refresher(self):
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join()
+            self._refresher = None
+
+    def _loaded_index(self) -> AnswerIndex:
+        if not self.index.loaded:
+            self.build_index()
+        return self.index
+
+    def process(self, input_statement, additional_response_selection_parameters=None):
+        index = self._loaded_index()
+        return self._choose(index, input_statement, index.search(input_statement.text, self.top_k))
+
+    def process_many(self, input_statements: List[Statement]) -> List[Statement]:
+        """
+        Mesmo resultado de `process` para várias mensagens, com a busca no
+        índice feita em lote (usado pelo /chat/batch)
+        """
+        index = self._loaded_index()
+        candidates = index.search_many([statement.text for statement in input_statements], self.top_k)
+        return [
+            self._choose(index, statement, statement_candidates)
+            for statement, statement_candidates in zip(input_statements, candidates)
+        ]
+
+    def _choose(self, index: AnswerIndex, input_statement: Statement,
+                candidates: List[Tuple[int, float]]) -> Statement:
+        """Reordena os candidatos do índice com a comparação do BestMatch e monta a resposta"""
+        closest_position, closest_confidence = None, 0
+        for position, _ in candidates:
+            _, question_text = index.question(position)
+            confidence = self.compare_statements(input_statement, Statement(text=question_text))
+            if confidence > closest_confidence:
+                closest_position, closest_confidence = position, confidence
+
+            # Mesmo critério de parada do BestMatch
+            if confidence >= self.maximum_similarity_threshold:
+                break
+
+        if closest_position is None:
+            return self.get_default_response(input_statement)
+
+        question_id, question_text = index.question(closest_position)
+        response_id, response_text = index.first_response(closest_position)
+
+        self.chatbot.logger.info('Using "{}" as a close match to "{}" with a confidence of {}'.format(
+            question_text, input_statement.text, closest_confidence
+        ))
+
+        response = Statement(text=response_text, in_response_to=question_text, id=response_id)
+        response.confidence = closest_confidence
+        # Usado pelo Responder para informar a pergunta casada sem nova consulta
+        response.question_id = question_id
+        return response
@@ -1,16 +1,19 @@
-from chatterbot import ChatBot
-from chatterbot.trainers import ChatterBotCorpusTrainer, ListTrainer
 import logging
 import argparse
-import uvicorn
-from handle_conversations import get_all_conversations
+from contextlib import nullcontext
+from handle_conversations import CONVERSATIONS_DIR
 from services.service_manager import ServiceManager
 from services.process_service import ProcessService
 from services.human_service import HumanService
+from state.store import StateStore
+from typing import Optional
 import uuid
 import os
 from dotenv import load_dotenv
 
+# ChatterBot, spaCy, NLTK e uvicorn são importados apenas quando usados, para que
+# importar este módulo (ex.: pelo api.py ou por workers do uvicorn) seja rápido
+
 # Disable logging
 logging.basicConfig(level=logging.INFO)
 logging.getLogger('chatterbot').setLevel(logging.INFO)
@@ -18,8 +21,33 @@ logging.getLogger('chatterbot').setLevel(logging.INFO)
 # Carrega variáveis de ambiente
 load_dotenv(override=True)
 
-def create_and_train_bot(force_training=True):
-    # Configuração do MongoDB
+# Corpus do ChatterBot usado no treinamento
+TRAINING_CORPUS = "chatterbot.corpus.portuguese"
+
+# Tempo máximo (em segundos) aguardando outra réplica terminar o treinamento
+TRAINING_WAIT_SECONDS = int(os.getenv('TRAINING_WAIT_SECONDS', '600'))
+
+# Diretório do índice de respostas compartilhado entre workers (--workers > 1)
+DEFAULT_INDEX_DIR = "/tmp/cnj-chatbot-index"
+
+# Aprendizado das conversas: sync (gravado na requisição), queue (fila gravada em
+# segundo plano), redis (fila gravada pelo learn-worker) ou off (somente leitura)
+LEARNING_MODE = os.getenv('LEARNING_MODE', 'sync')
+
+# Tagger que gera o search_text: pipeline (spaCy reduzido, em lote e com cache)
+# ou chatterbot (PosLemmaTagger original)
+NLP_TAGGER = os.getenv('NLP_TAGGER', 'pipeline')
+
+# Verificação do plano das consultas frequentes ao MongoDB na inicialização:
+# off, warn (registra aviso se houver COLLSCAN) ou fail (interrompe a inicialização)
+MONGO_INDEX_CHECK = os.getenv('MONGO_INDEX_CHECK', 'warn')
+
+# Intervalo (segundos) da verificação de statements aprendidos que reconstrói
+# o índice de respostas (0 desativa; sem efeito com LEARNING_MODE=off)
+INDEX_REFRESH_SECONDS = float(os.getenv('INDEX_REFRESH_SECONDS', '30'))
+
+def mongo_storage_config() -> dict:
+    """Configuração do storage MongoDB do ChatterBot"""
     mongo_host = os.getenv('MONGO_HOST', 'mongodb')
     mongo_port = os.getenv('MONGO_PORT', '27017')
     mongo_db = os.getenv('MONGO_DB', 'cnj-chatbot')
@@ -28,8 +56,7 @@ def create_and_train_bot(force_training=True):
     # URL de conexão completa
     mongo_uri = f"mongodb://{mongo_host}:{mongo_port}/{mongo_db}"
 
-    # Configuração do MongoDB
-    mongo_config = {
+    return {
         'import_path': 'chatterbot.storage.MongoDatabaseAdapter',
         'database_uri': mongo_uri,
         'serverSelectionTimeoutMS': 5000,
@@ -42,57 +69,85 @@ def create_and_train_bot(force_training=True):
         'minPoolSize': 1
     }
 
+def create_and_train_bot(force_training=False, timeline=None):
+    """
+    Cria o chatbot, garante o treinamento e constrói o índice de respostas.
+    `timeline` (StartupTimeline) registra a duração de cada fase, se informado.
+    """
+    phase = timeline.phase if timeline else lambda name: nullcontext()
+
+    with phase("nlp_imports"):
+        from chatterbot import ChatBot
+        from chatterbot.tagging import PosLemmaTagger
+        from nlp.tagger import PipelineTagger
+        from training.pipeline import ensure_trained
+
+    # Configuração do MongoDB
+    mongo_config = mongo_storage_config()
+
+    # Motor de busca de respostas: vector (índice em memória) ou bestmatch (varredura no MongoDB)
+    retrieval_engine = os.getenv('RETRIEVAL_ENGINE', 'vector')
+    logic_adapter_path = {
+        'vector': 'logic.vector_best_match.VectorBestMatch',
+        'bestmatch': 'chatterbot.logic.BestMatch'
+    }[retrieval_engine]
+    logging.info(f"Motor de busca de respostas: {retrieval_engine}")
+
+    logic_adapter = {
+        'import_path': logic_adapter_path,
+        'default_response': 'Desculpe, não entendi sua pergunta. Poderia reformular sua pergunta?',
+        'maximum_similarity_threshold': 0.95
+    }
+    if retrieval_engine == 'vector':
+        # Índice gravado por versão do treinamento e compartilhado via memory-map
+        logic_adapter['index_dir'] = os.getenv('INDEX_DIR')
+
     try:
         # Create a new chatbot
-        chatbot = ChatBot(
-            'CNJBot',
-            storage_adapter=mongo_config,
-            logic_adapters=[
-                {
-                    'import_path': 'chatterbot.logic.BestMatch',
-                    'default_response': 'Desculpe, não entendi sua pergunta. Poderia reformular sua pergunta?',
-                    'maximum_similarity_threshold': 0.95
-                }
-            ],
-            read_only=False # Is this read only training?
-        )
+        with phase("chatbot"):
+            chatbot = ChatBot(
+                'CNJBot',
+                storage_adapter=mongo_config,
+                logic_adapters=[logic_adapter],
+                tagger=PipelineTagger if NLP_TAGGER == 'pipeline' else PosLemmaTagger,
+                # Fora do modo sync a resposta não grava nada no MongoDB;
+                # o aprendizado vai para a fila de write-behind (Responder)
+                read_only=LEARNING_MODE != 'sync'
+            )
 
-        # Verifica se precisa treinar
-        if force_training:
-            logging.info("Forçando treinamento do chatbot...")
-            _train_chatbot(chatbot)
-        else:
-            # Verifica se já existem dados treinados
-            statement_count = chatbot.storage.count()
-            if statement_count < 100:  # Número arbitrário, ajuste conforme necessário
-                logging.info(f"Poucos dados encontrados ({statement_count}). Iniciando treinamento...")
-                _train_chatbot(chatbot)
-            else:
-                logging.info(f"Chatbot já treinado com {statement_count} exemplos. Pulando treinamento.")
+        # Índices da coleção de statements, antes do treinamento que os utiliza
+        with phase("indexes"):
+            from database.indexes import check_statement_indexes
+            check_statement_indexes(chatbot.storage, MONGO_INDEX_CHECK)
+
+        # Treina apenas o que mudou no corpus ou nos CSVs desde o último snapshot
+        # O hash do snapshot identifica a versão das respostas (usado pelo cache)
+        with phase("training"):
+            chatbot.training_hash = ensure_trained(
+                chatbot,
+                TRAINING_CORPUS,
+                CONVERSATIONS_DIR,
+                force_training=force_training,
+                wait_timeout=TRAINING_WAIT_SECONDS
+            )
+
+        # Constrói o índice de respostas com os dados já treinados
+        with phase("index"):
+            for adapter in chatbot.logic_adapters:
+                if hasattr(adapter, 'build_index'):
+                    adapter.build_index(chatbot.training_hash)
+                    # O que for aprendido entra no índice na próxima verificação
+                    if INDEX_REFRESH_SECONDS > 0 and LEARNING_MODE != 'off':
+                        adapter.start_refresher(INDEX_REFRESH_SECONDS)
 
         return chatbot
     except Exception as e:
         logging.error(f"Erro ao criar chatbot: {str(e)}")
         raise
 
-def _train_chatbot(chatbot):
-    """Função auxiliar para treinar o chatbot"""
-    # Create trainers
-    corpus_trainer = ChatterBotCorpusTrainer(chatbot)
-    list_trainer = ListTrainer(chatbot)
-
-    # Train with Portuguese corpus
-    corpus_trainer.train("chatterbot.corpus.portuguese")
-
-    # Get all conversations from our organized file
-    legal_conversations = get_all_conversations()
-
-    # Train with specific conversations
-    list_trainer.train(legal_conversations)
-
-def setup_services(chatbot: ChatBot) -> ServiceManager:
+def setup_services(chatbot, store: Optional[StateStore] = None) -> ServiceManager:
     """Configura e retorna o gerenciador de serviços"""
-    service_manager = ServiceManager()
+    service_manager = ServiceManager(store)
     
     # Registra os serviços disponíveis
     service_manager.register_service(ProcessService())
@@ -105,11 +160,17 @@ def setup_services(chatbot: ChatBot) -> ServiceManager:
     
     return service_manager
 
-def run_cli():
+def run_cli(force_training: bool = False):
     """Executa o chatbot no modo CLI"""
+    from logic.responder import Responder
+    from logic.response_cache import create_response_cache
+    from workers.learning_queue import create_learning_queue
+
     print("Inicializando chatbot do Poder Judiciário...")
-    chatbot = create_and_train_bot()
+    chatbot = create_and_train_bot(force_training=force_training)
     service_manager = setup_services(chatbot)
+    learning_queue = create_learning_queue(LEARNING_MODE, chatbot.storage)
+    responder = Responder(chatbot, create_response_cache(chatbot.training_hash), learning_queue)
     print("Chatbot está pronto! Digite 'sair' para encerrar.")
     print("Como eu posso ajudar você hoje?")
     
@@ -120,6 +181,8 @@ def run_cli():
         user_input = input("Você: ")
         if user_input.lower() == 'sair':
             print("Até logo! Obrigado por utilizar nossos serviços.")
+            if learning_queue:
+                learning_queue.stop()
             break
             
         try:
@@ -132,22 +195,107 @@ def run_cli():
                     continue
             
             # Se nenhum serviço respondeu, usa o ChatterBot
-            response = chatbot.get_response(user_input)
-            print(f"Bot: {response}")
+            response = responder.get_response(user_input)
+            print(f"Bot: {response.text}")
         except Exception as e:
             print(f"Bot: Desculpe, ocorreu um erro ao processar sua solicitação. Por favor, tente novamente mais tarde.")
 
-def run_api(host: str = "127.0.0.1", port: int = 8000):
-    """Executa o chatbot no modo API"""
-    uvicorn.run("api:app", host=host, port=port, reload=True)
+def run_learn_worker():
+    """
+    Consome a fila de aprendizado publicada no Redis (LEARNING_MODE=redis)
+    e grava os eventos no MongoDB em lotes, até ser interrompido
+    """
+    from chatterbot.utils import initialize_class
+    from state.redis_client import create_redis_client
+    from workers.learning_queue import DEFAULT_REDIS_KEY, MongoLearningSink, consume_redis_learning
+
+    storage = initialize_class(mongo_storage_config())
+    key = os.getenv('LEARNING_REDIS_KEY', DEFAULT_REDIS_KEY)
+    print(f"Gravando eventos de aprendizado de {key}...")
+    try:
+        consume_redis_learning(
+            create_redis_client(),
+            MongoLearningSink(storage),
+            key=key,
+            batch_size=int(os.getenv('LEARNING_BATCH_SIZE', '200'))
+        )
+    except KeyboardInterrupt:
+        print("Learn-worker encerrado.")
+
+def run_indexes():
+    """
+    Cria os índices do MongoDB e mostra o plano das consultas frequentes.
+    Encerra com código 1 se alguma delas fizer varredura completa (COLLSCAN)
+    """
+    from chatterbot.utils import initialize_class
+    from database.indexes import check_statement_indexes
+
+    storage = initialize_class(mongo_storage_config())
+    report = check_statement_indexes(storage, mode='warn')
+    print(f"Índices criados: {', '.join(report['created']) or 'nenhum'}")
+    for item in report['queries']:
+        if item['collscan'] is None:
+            print(f"{item['query']}: plano indisponível ({item['error']})")
+        else:
+            status = "COLLSCAN" if item['collscan'] else "ok"
+            print(f"{item['query']}: {status} ({', '.join(item['stages'])})")
+    if any(item['collscan'] for item in report['queries']):
+        raise SystemExit(1)
+
+def prepare_index(force_training: bool = False):
+    """Treina o chatbot (se necessário) e grava o índice de respostas em INDEX_DIR"""
+    create_and_train_bot(force_training=force_training)
+
+def run_api(host: str = "127.0.0.1", port: int = 8000, reload: bool = False,
+            workers: int = 1, cluster: str = "local"):
+    """
+    Executa o chatbot no modo API. Sem `reload` (produção) o processo é
+    iniciado uma única vez; com `reload` (desenvolvimento) o uvicorn reinicia
+    a aplicação, e todo o carregamento, a cada alteração nos arquivos.
+
+    Com `workers` > 1 o treinamento e o índice são preparados uma única vez,
+    em um processo separado, antes de iniciar os workers; cada worker abre o
+    índice gravado com memory-map, compartilhando as páginas em memória.
+    O modo de `cluster` e o número de workers são repassados à API pelas
+    variáveis CHATBOT_CLUSTER e CHATBOT_WORKERS.
+    """
+    import uvicorn
+
+    os.environ['CHATBOT_CLUSTER'] = cluster
+    os.environ['CHATBOT_WORKERS'] = str(workers)
+
+    if workers > 1 and not reload:
+        os.environ.setdefault('INDEX_DIR', DEFAULT_INDEX_DIR)
+        # Processo separado para que o supervisor dos workers não mantenha o modelo em memória
+        from multiprocessing import Process
+        process = Process(
+            target=prepare_index,
+            args=(os.getenv('FORCE_TRAINING', 'false').lower() == 'true',),
+            name="prepare-index"
+        )
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            raise SystemExit("Falha ao preparar o índice de respostas")
+        # O treinamento já foi feito; os workers apenas reabrem o snapshot e o índice
+        os.environ['FORCE_TRAINING'] = 'false'
+
+    uvicorn.run("api:app", host=host, port=port, reload=reload, workers=None if reload else workers)
+
+def run_training(force_training: bool = False):
+    """Treina o chatbot (se necessário) e encerra, para uso em jobs de implantação"""
+    create_and_train_bot(force_training=force_training)
+    print("Treinamento concluído.")
 
 def main():
     parser = argparse.ArgumentParser(description="Chatbot do CNJ")
     parser.add_argument(
         "--mode",
-        choices=["cli", "api"],
+        choices=["cli", "api", "train", "learn-worker", "indexes"],
         default="cli",
-        help="Modo de execução: cli (interface de linha de comando) ou api (servidor web)"
+        help="Modo de execução: cli (interface de linha de comando), api (servidor web), train (apenas "
+             "treinamento), learn-worker (grava a fila de aprendizado do Redis no MongoDB) ou indexes "
+             "(cria os índices do MongoDB e verifica o plano das consultas)"
     )
     parser.add_argument(
         "--host",
@@ -164,15 +312,38 @@ def main():
         "--cluster",
         choices=["local", "kubernetes"],
         default="local",
-        help="Modo de execução: local (localhost) ou kubernetes (Kubernetes)"
+        help="Ambiente: local (estado em memória, polling do Telegram) ou kubernetes "
+             "(estado no Redis, Telegram via webhook, sem polling no processo)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Número de processos da API; o índice é construído uma vez e compartilhado (apenas no modo api)"
+    )
+    parser.add_argument(
+        "--reload",
+        action="store_true",
+        help="Reinicia a API a cada alteração nos arquivos (apenas para desenvolvimento)"
+    )
+    parser.add_argument(
+        "--force-training",
+        action="store_true",
+        help="Retreina o chatbot mesmo que o snapshot de treinamento esteja atualizado"
     )
     
     args = parser.parse_args()
     
     if args.mode == "cli":
-        run_cli()
+        run_cli(args.force_training)
+    elif args.mode == "train":
+        run_training(args.force_training)
+    elif args.mode == "learn-worker":
+        run_learn_worker()
+    elif args.mode == "indexes":
+        run_indexes()
     else:
-        run_api(args.host, args.port)
+        run_api(args.host, args.port, args.reload, args.workers, args.cluster)
 
 if __name__ == "__main__":
     main()
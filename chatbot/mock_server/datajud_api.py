@@ -0,0 +1,129 @@
+"""
+Servidor HTTP que imita a API pública do DataJud (CNJ) para testes locais.
+
+Responde a `POST /api_publica_<tribunal>/_search` com o formato do
+Elasticsearch usado pelo DataJud. Qualquer número com dígitos verificadores
+válidos é encontrado, exceto os de sequencial 0000000, que simulam um
+processo inexistente. Permite simular latência e uma taxa de falhas (503)
+para exercitar o cache, o agrupamento de consultas e o circuit breaker.
+
+Uso:
+    python -m mock_server.datajud_api --port 8082 --latency 0.2 --fail-rate 0.1
+    PROCESS_LOOKUP_BACKEND=datajud DATAJUD_URL=http://localhost:8082
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+PATH_PATTERN = re.compile(r"^/api_publica_(?P<alias>\w+)/_search$")
+
+
+class FakeDataJudState:
+    """Configuração de latência e falhas e contadores de consultas por número"""
+
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.queries = Counter()
+        self.failures = 0
+
+    def source(self, alias: str, number: str) -> dict:
+        """Documento do processo no formato do DataJud"""
+        return {
+            "numeroProcesso": number,
+            "tribunal": alias.upper(),
+            "classe": {"codigo": 7, "nome": "Procedimento Comum Cível"},
+            "assuntos": [{"codigo": 10431, "nome": "Indenização por Dano Moral"}],
+            "dataHoraUltimaAtualizacao": "2024-03-20T10:15:00.000Z",
+            "movimentos": [
+                {"codigo": 26, "nome": "Distribuição", "dataHora": "2024-01-10T09:00:00.000Z"},
+                {"codigo": 11010, "nome": "Conclusão", "dataHora": "2024-03-20T10:15:00.000Z"},
+            ],
+        }
+
+
+def make_handler(state: FakeDataJudState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, body: dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _params(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length)) if length else {}
+
+        def _dispatch(self):
+            path = urlparse(self.path).path
+            params = self._params()
+            if state.latency:
+                time.sleep(state.latency)
+
+            if path == "/_stats":
+                # Rota exclusiva do servidor falso, útil para inspeção em testes
+                with state.lock:
+                    return self._reply(200, {"queries": dict(state.queries), "failures": state.failures})
+
+            match = PATH_PATTERN.match(path)
+            if not match:
+                return self._reply(404, {"error": "index_not_found_exception", "status": 404})
+
+            number = str(params.get("query", {}).get("match", {}).get("numeroProcesso", ""))
+            with state.lock:
+                state.queries[number] += 1
+                failed = state.fail_rate and random.random() < state.fail_rate
+                if failed:
+                    state.failures += 1
+            if failed:
+                return self._reply(503, {"error": "unavailable", "status": 503})
+
+            hits = []
+            if number and not number.startswith("0000000"):
+                hits.append({"_index": f"api_publica_{match.group('alias')}", "_source": state.source(match.group("alias"), number)})
+            return self._reply(200, {"hits": {"total": {"value": len(hits)}, "hits": hits}})
+
+        do_GET = _dispatch
+        do_POST = _dispatch
+
+    return Handler
+
+
+def start_server(host: str = "127.0.0.1", port: int = 8082, latency: float = 0.0, fail_rate: float = 0.0):
+    """Inicia o servidor em uma thread e retorna (servidor, estado)"""
+    state = FakeDataJudState(latency=latency, fail_rate=fail_rate)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API falsa do DataJud para testes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência simulada (segundos)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fração das consultas que respondem 503")
+    args = parser.parse_args()
+
+    state = FakeDataJudState(latency=args.latency, fail_rate=args.fail_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"API falsa do DataJud em http://{args.host}:{args.port}/api_publica_<tribunal>/_search")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Servidor HTTP que imita a API do Telegram Bot para testes locais.
+
+Implementa sendMessage, getUpdates e setWebhook. Aplica o limite de uma
+mensagem por segundo por chat (com rajada configurável), respondendo 429
+com `retry_after` como o Telegram, e permite simular latência.
+
+Uso:
+    python -m mock_server.telegram_api --port 8081 --latency 0.05
+    TELEGRAM_API_URL=http://localhost:8081/bot
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PATH_PATTERN = re.compile(r"^/bot(?P<token>[^/]+)/(?P<method>\w+)$")
+
+
+class FakeTelegramState:
+    """Mensagens recebidas, atualizações pendentes e janelas de limite por chat"""
+
+    def __init__(self, chat_burst: int = 3, latency: float = 0.0):
+        self.chat_burst = chat_burst
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.sent = []
+        self.updates = []
+        self.next_update_id = 1
+        self.rate_limited = 0
+        self.chat_windows = defaultdict(list)
+        self.webhook = None
+
+    def add_update(self, chat_id, text: str):
+        """Simula uma mensagem enviada por um usuário ao bot"""
+        with self.lock:
+            self.updates.append({
+                "update_id": self.next_update_id,
+                "message": {"chat": {"id": chat_id}, "text": text, "date": int(time.time())}
+            })
+            self.next_update_id += 1
+
+    def check_rate(self, chat_id) -> int:
+        """Retorna 0 se o envio é permitido ou os segundos a aguardar"""
+        now = time.monotonic()
+        with self.lock:
+            window = [sent_at for sent_at in self.chat_windows[chat_id] if now - sent_at < 1.0]
+            if len(window) >= self.chat_burst:
+                self.chat_windows[chat_id] = window
+                self.rate_limited += 1
+                return 1
+            window.append(now)
+            self.chat_windows[chat_id] = window
+            return 0
+
+
+def make_handler(state: FakeTelegramState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, body: dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _params(self) -> dict:
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                params.update(json.loads(self.rfile.read(length)))
+            return params
+
+        def _dispatch(self):
+            match = PATH_PATTERN.match(urlparse(self.path).path)
+            params = self._params()
+            if state.latency:
+                time.sleep(state.latency)
+            if not match:
+                return self._reply(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+
+            method = match.group("method")
+            if method == "sendMessage":
+                retry_after = state.check_rate(params.get("chat_id"))
+                if retry_after:
+                    return self._reply(429, {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": f"Too Many Requests: retry after {retry_after}",
+                        "parameters": {"retry_after": retry_after}
+                    })
+                with state.lock:
+                    state.sent.append(params)
+                    message_id = len(state.sent)
+                return self._reply(200, {"ok": True, "result": {"message_id": message_id}})
+
+            if method == "getUpdates":
+                offset = int(params.get("offset", 0))
+                with state.lock:
+                    result = [update for update in state.updates if update["update_id"] >= offset]
+                return self._reply(200, {"ok": True, "result": result[:100]})
+
+            if method == "setWebhook":
+                state.webhook = params
+                return self._reply(200, {"ok": True, "result": True})
+
+            if method == "getStats":
+                # Método exclusivo do servidor falso, útil para inspeção em testes
+                with state.lock:
+                    return self._reply(200, {
+                        "ok": True,
+                        "result": {"sent": len(state.sent), "rate_limited": state.rate_limited}
+                    })
+
+            return self._reply(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+
+        do_GET = _dispatch
+        do_POST = _dispatch
+
+    return Handler
+
+
+def start_server(host: str = "127.0.0.1", port: int = 8081, chat_burst: int = 3, latency: float = 0.0):
+    """Inicia o servidor em uma thread e retorna (servidor, estado)"""
+    state = FakeTelegramState(chat_burst=chat_burst, latency=latency)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API falsa do Telegram para testes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--chat-burst", type=int, default=3, help="Mensagens por segundo aceitas por chat")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência simulada (segundos)")
+    args = parser.parse_args()
+
+    state = FakeTelegramState(chat_burst=args.chat_burst, latency=args.latency)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"API falsa do Telegram em http://{args.host}:{args.port}/bot<token>/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ReadinessChecker:
+    """
+    Executa as verificações de prontidão (modelo carregado, MongoDB, Redis)
+    e guarda o resultado por `cache_seconds`, para que probes frequentes de
+    várias réplicas não gerem carga nos backends.
+
+    Cada verificação é uma função que retorna um dicionário de detalhes (ou
+    None) quando tudo está bem e levanta exceção quando não está. As
+    verificações devem ter timeout próprio, menor que o do probe.
+    """
+
+    def __init__(self, checks: Dict[str, Callable[[], Optional[dict]]], cache_seconds: float = 5.0):
+        self.checks = checks
+        self.cache_seconds = cache_seconds
+        self._lock = threading.Lock()
+        self._report: Optional[dict] = None
+        self._checked_at = 0.0
+
+    def _run_checks(self) -> dict:
+        results = {}
+        for name, check in self.checks.items():
+            start = time.perf_counter()
+            try:
+                details = check() or {}
+                results[name] = {'ok': True, **details}
+            except Exception as e:
+                results[name] = {'ok': False, 'error': str(e)}
+            results[name]['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return {
+            'ready': all(result['ok'] for result in results.values()),
+            'checks': results,
+        }
+
+    def check(self) -> dict:
+        """
+        Retorna o último resultado, refazendo as verificações se expirou.
+        Enquanto uma requisição refaz as verificações, as demais recebem o
+        último resultado em vez de aguardar o lock (só a primeira verificação
+        de todas é aguardada)
+        """
+        report = self._report
+        if report is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+            return report
+        if not self._lock.acquire(blocking=report is None):
+            return report
+        try:
+            now = time.monotonic()
+            if self._report is None or now - self._checked_at >= self.cache_seconds:
+                report = self._run_checks()
+                if not report['ready']:
+                    failed = [name for name, result in report['checks'].items() if not result['ok']]
+                    logger.warning(f"Réplica não está pronta: {', '.join(failed)}")
+                self._report = report
+                self._checked_at = time.monotonic()
+            return self._report
+        finally:
+            self._lock.release()
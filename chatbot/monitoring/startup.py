@@ -0,0 +1,91 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+STARTUP_PHASE_SECONDS = REGISTRY.gauge(
+    "chatbot_startup_phase_seconds",
+    "Duração de cada fase da inicialização",
+    ["phase"]
+)
+COLD_START_SECONDS = REGISTRY.gauge(
+    "chatbot_cold_start_seconds",
+    "Tempo entre o início do processo e a réplica ficar pronta"
+)
+
+
+def process_uptime() -> Optional[float]:
+    """Segundos desde o início do processo (Linux), ou None se indisponível"""
+    try:
+        with open("/proc/self/stat") as f:
+            # O nome do processo pode conter espaços; os campos seguem o último ')'
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+        return system_uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimeline:
+    """
+    Registra as fases da inicialização (importação do NLP, treinamento,
+    índice, conexões) com suas durações, para os logs, o /ready e o /metrics.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.phases: List[Tuple[str, float]] = []
+        self.current: Optional[str] = None
+        self.completed = False
+        self.error: Optional[str] = None
+        self.cold_start: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Mede uma fase da inicialização"""
+        self.current = name
+        logger.info(f"Inicialização: fase '{name}' iniciada")
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases.append((name, elapsed))
+            STARTUP_PHASE_SECONDS.set(round(elapsed, 3), phase=name)
+            logger.info(f"Inicialização: fase '{name}' concluída em {elapsed:.2f}s")
+
+    def finish(self):
+        """Marca a inicialização como concluída e registra o resumo"""
+        self.current = None
+        self.completed = True
+        elapsed = time.monotonic() - self.started_at
+        # Inclui a importação dos módulos e o carregamento do servidor, quando disponível
+        self.cold_start = process_uptime() or elapsed
+        COLD_START_SECONDS.set(round(self.cold_start, 3))
+        summary = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases)
+        logger.info(f"Inicialização concluída em {elapsed:.2f}s ({summary}); cold start {self.cold_start:.2f}s")
+
+    def fail(self, error: Exception):
+        self.error = f"{self.current or 'inicialização'}: {error}"
+        logger.error(f"Falha na inicialização ({self.error})", exc_info=error)
+
+    def report(self) -> dict:
+        with self._lock:
+            phases = {name: round(seconds, 3) for name, seconds in self.phases}
+        return {
+            'completed': self.completed,
+            'current_phase': self.current,
+            'error': self.error,
+            'phases_s': phases,
+            'cold_start_s': round(self.cold_start, 3) if self.cold_start is not None else None,
+        }
@@ -0,0 +1,142 @@
+import logging
+import os
+import string
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+from chatterbot import constants, languages
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineTagger:
+    """
+    Substituto do PosLemmaTagger do ChatterBot que gera o mesmo `search_text`
+    (pares POS:lema) com um pipeline do spaCy reduzido.
+
+    - Carrega apenas os componentes usados pelo POS e pelo lema: o parser, o
+      NER e o senter ficam de fora (`SPACY_EXCLUDE`);
+    - no treinamento, `get_text_index_strings` processa os textos em lote com
+      `nlp.pipe` (`SPACY_BATCH_SIZE`, `SPACY_N_PROCESS`);
+    - no atendimento, `get_search_text` (chamado pelo Responder) memoriza o
+      resultado das mensagens frequentes em um LRU de `NLP_CACHE_SIZE` entradas;
+    - `get_text_index_string`, usado pelo ChatterBot nos trainers e no
+      `storage.create`, não passa pelo LRU e conta como treinamento;
+    - `stats()` informa documentos, tokens e tokens/s de cada caminho.
+
+    O ChatterBot instancia o tagger apenas com `language`, por isso o restante
+    da configuração vem de variáveis de ambiente.
+    """
+
+    def __init__(self, language=None):
+        import spacy
+
+        self.language = language or languages.ENG
+        self.punctuation_table = str.maketrans(dict.fromkeys(string.punctuation))
+
+        try:
+            model = os.getenv('SPACY_MODEL') or constants.DEFAULT_LANGUAGE_TO_SPACY_MODEL_MAP[self.language]
+        except KeyError as e:
+            raise KeyError(f'Modelo do spaCy não disponível para o idioma {self.language}') from e
+
+        exclude = [name.strip() for name in os.getenv('SPACY_EXCLUDE', 'parser,ner,senter').split(',') if name.strip()]
+        self.nlp = spacy.load(model, exclude=exclude)
+        logger.info(f"Pipeline do spaCy {model}: {', '.join(self.nlp.pipe_names)}")
+
+        self.batch_size = int(os.getenv('SPACY_BATCH_SIZE', '256'))
+        self.n_process = int(os.getenv('SPACY_N_PROCESS', '1'))
+        self.cache_size = int(os.getenv('NLP_CACHE_SIZE', '10000'))
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self._counters: Dict[str, Dict[str, float]] = {
+            path: {'documents': 0, 'tokens': 0, 'seconds': 0.0} for path in ('serving', 'training')
+        }
+
+    def _prepare(self, text: str) -> str:
+        """Textos de até 2 caracteres perdem a pontuação (mesma regra do PosLemmaTagger)"""
+        if len(text) <= 2:
+            text_without_punctuation = text.translate(self.punctuation_table)
+            if len(text_without_punctuation) >= 1:
+                return text_without_punctuation
+        return text
+
+    @staticmethod
+    def _index_string(document, text: str) -> str:
+        """Pares POS:lema entre tokens alfabéticos consecutivos que não são stopwords"""
+        bigram_pairs = []
+
+        if len(text) <= 2:
+            bigram_pairs = [token.lemma_.lower() for token in document]
+        else:
+            tokens = [token for token in document if token.is_alpha and not token.is_stop]
+            if len(tokens) < 2:
+                tokens = [token for token in document if token.is_alpha]
+
+            for index in range(1, len(tokens)):
+                bigram_pairs.append('{}:{}'.format(tokens[index - 1].pos_, tokens[index].lemma_.lower()))
+
+        if not bigram_pairs:
+            bigram_pairs = [token.lemma_.lower() for token in document]
+
+        return ' '.join(bigram_pairs)
+
+    def _record(self, path: str, documents: int, tokens: int, seconds: float):
+        with self._lock:
+            counters = self._counters[path]
+            counters['documents'] += documents
+            counters['tokens'] += tokens
+            counters['seconds'] += seconds
+
+    def _tag(self, text: str, path: str) -> str:
+        start = time.perf_counter()
+        prepared = self._prepare(text)
+        document = self.nlp(prepared)
+        result = self._index_string(document, prepared)
+        self._record(path, 1, len(document), time.perf_counter() - start)
+        return result
+
+    def get_text_index_string(self, text: str) -> str:
+        """`search_text` de um statement gravado (trainers e `storage.create` do ChatterBot)"""
+        return self._tag(text, 'training')
+
+    def get_search_text(self, text: str) -> str:
+        """`search_text` de uma mensagem recebida (caminho de atendimento, com memorização)"""
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                self.cache_hits += 1
+                return cached
+
+        result = self._tag(text, 'serving')
+        if self.cache_size:
+            with self._lock:
+                self._cache[text] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def get_text_index_strings(self, texts: List[str]) -> List[str]:
+        """`search_text` de vários textos em lote com `nlp.pipe` (caminho de treinamento)"""
+        start = time.perf_counter()
+        prepared = [self._prepare(text) for text in texts]
+        results, tokens = [], 0
+        for document, text in zip(self.nlp.pipe(prepared, batch_size=self.batch_size, n_process=self.n_process), prepared):
+            results.append(self._index_string(document, text))
+            tokens += len(document)
+        self._record('training', len(texts), tokens, time.perf_counter() - start)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            report = {'cache_size': len(self._cache), 'cache_hits': self.cache_hits}
+            for path, counters in self._counters.items():
+                seconds = counters['seconds']
+                report[path] = dict(
+                    counters,
+                    tokens_per_second=round(counters['tokens'] / seconds) if seconds else 0
+                )
+        return report
@@ -1,21 +1,48 @@
 from abc import ABC, abstractmethod
-from typing import Tuple, Optional
+from typing import Dict, List, Set, Tuple, Optional
+
+from .keyword_matcher import KeywordMatcher
 
 class BaseService(ABC):
     """Classe base para todos os serviços do chatbot"""
     
     def __init__(self):
         self.conversation_state = {}
+        self._matcher: Optional[KeywordMatcher] = None
+    
+    @property
+    def name(self) -> str:
+        """Nome do serviço, usado nas chaves do armazenamento de estado"""
+        return self.__class__.__name__
+    
+    def keyword_groups(self) -> Dict[str, List[str]]:
+        """
+        Palavras-chave do serviço agrupadas por rótulo (ex.: "process:query").
+        O ServiceManager compila os grupos de todos os serviços em um único
+        KeywordMatcher e repassa os rótulos encontrados em `hits`.
+        """
+        return {}
+    
+    def find_keywords(self, text: str, hits: Optional[Set[str]] = None) -> Set[str]:
+        """
+        Retorna os rótulos de palavras-chave presentes no texto.
+        Usa `hits` quando já calculados pelo ServiceManager.
+        """
+        if hits is not None:
+            return hits
+        if self._matcher is None:
+            self._matcher = KeywordMatcher(self.keyword_groups())
+        return self._matcher.find(text)
     
     @abstractmethod
-    def can_handle(self, text: str) -> bool:
+    def can_handle(self, text: str, hits: Optional[Set[str]] = None) -> bool:
         """
         Verifica se este serviço pode lidar com a mensagem
         """
         pass
     
     @abstractmethod
-    def handle(self, user_id: str, text: str) -> Tuple[str, bool, int]:
+    def handle(self, user_id: str, text: str, hits: Optional[Set[str]] = None) -> Tuple[str, bool, int]:
         """
         Processa a mensagem e retorna (resposta, se_continua_conversa, status)
         Status codes:
@@ -25,6 +52,14 @@ class BaseService(ABC):
         """
         pass
     
+    def is_in_flow(self, user_id: str) -> bool:
+        """
+        Verifica se o usuário está no meio de um fluxo deste serviço.
+        Enquanto estiver, o ServiceManager encaminha as mensagens dele
+        diretamente para este serviço, sem consultar `can_handle`.
+        """
+        return bool(self.conversation_state.get(user_id))
+    
     def get_user_state(self, user_id: str) -> dict:
         """Obtém o estado da conversa do usuário"""
         if user_id not in self.conversation_state:
@@ -1,10 +1,8 @@
-from typing import Tuple, Dict, List
-import json
-import os
-from pathlib import Path
+from typing import Tuple, Dict, List, Optional, Set
 
 from dotenv import load_dotenv
 from .base_service import BaseService
+from .tribunal_directory import TribunalDirectory, create_tribunal_directory
 
 # Carrega variáveis de ambiente
 load_dotenv(override=True)
@@ -12,7 +10,7 @@ load_dotenv(override=True)
 class HumanService(BaseService):
     """Serviço para transferência para atendente humano"""
     
-    def __init__(self):
+    def __init__(self, directory: Optional[TribunalDirectory] = None):
         super().__init__()
         # Palavras-chave para identificar solicitações de atendente humano
         self.keywords = [
@@ -31,57 +29,37 @@ class HumanService(BaseService):
             'quero falar com uma pessoa'
         ]
         
-        # Carrega dados dos tribunais
-        self.tribunals = self._load_tribunals()
-        
-    def _load_tribunals(self) -> Dict:
-        """Carrega dados dos tribunais dos arquivos JSON"""
-        tribunals = {}
-        config_dir = Path("config/tribunals")
-        
-        if not config_dir.exists():
-            print(f"Diretório de configuração não encontrado: {config_dir}")
-            return tribunals
-            
-        for json_file in config_dir.glob("*.json"):
-            try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    tribunal_data = json.load(f)
-                    tribunals[tribunal_data['code']] = tribunal_data
-            except Exception as e:
-                print(f"Erro ao carregar arquivo {json_file}: {str(e)}")
-                
-        return tribunals
+        # Diretório de tribunais compilado, recarregado quando os arquivos mudam
+        self.directory = directory or create_tribunal_directory()
+    
+    def keyword_groups(self) -> Dict[str, List[str]]:
+        """Palavras-chave de transferência (os tribunais ficam no diretório compilado)"""
+        return {'human:transfer': self.keywords}
     
     def _get_tribunal_from_text(self, text: str) -> Tuple[str, str]:
         """
         Identifica qual tribunal e unidade foram mencionados no texto
         Returns: (tribunal_code, unit_code) ou ("", "") se não encontrado
         """
-        text = text.lower()
-        
-        for tribunal_code, tribunal_data in self.tribunals.items():
-            # Verifica palavras-chave do tribunal
-            if any(keyword in text for keyword in tribunal_data['keywords'].get(tribunal_code, [])):
-                # Verifica palavras-chave das unidades
-                for unit_code, keywords in tribunal_data['keywords'].items():
-                    if unit_code != tribunal_code and any(keyword in text for keyword in keywords):
-                        return tribunal_code, unit_code
-                return tribunal_code, ""
-                
-        return "", ""
+        return self.directory.current.find(text)
+    
+    def _confirmation_message(self, tribunal_code: str, unit_code: str) -> str:
+        entry = self.directory.current.entry(tribunal_code, unit_code)
+        return (
+            f"Entendi que você quer falar com um atendente da {entry.name}.\n"
+            f"Horário de atendimento: {entry.schedule}\n\n"
+            "Antes de transferir, gostaria de confirmar: você realmente precisa falar com um atendente? "
+            "Posso tentar te ajudar primeiro."
+        )
     
-    def can_handle(self, text: str) -> bool:
+    def can_handle(self, text: str, hits: Optional[Set[str]] = None) -> bool:
         """Verifica se o texto é uma solicitação de atendente humano"""
-        # Verifica se está em uma conversa de transferência
-        if self._is_in_transfer_conversation():
-            return True
-        # Verifica se contém palavras-chave de transferência
-        return any(keyword in text.lower() for keyword in self.keywords)
+        return self._is_transfer_request(text, hits)
     
-    def handle(self, user_id: str, text: str) -> Tuple[str, bool, int]:
+    def handle(self, user_id: str, text: str, hits: Optional[Set[str]] = None) -> Tuple[str, bool, int]:
         """Processa a solicitação de atendente humano"""
         state = self.get_user_state(user_id)
+        hits = self.find_keywords(text, hits)
         
         # Se já está esperando confirmação de tribunal
         if state.get("waiting_for_tribunal"):
@@ -92,24 +70,17 @@ class HumanService(BaseService):
                 state["waiting_for_tribunal"] = False
                 state["waiting_for_confirmation"] = True
                 
-                tribunal_data = self.tribunals[tribunal_code]
-                unit_data = tribunal_data['units'].get(unit_code, {})
-                
                 return (
-                    f"Entendi que você quer falar com um atendente da {unit_data.get('name', tribunal_data['name'])}.\n"
-                    f"Horário de atendimento: {unit_data.get('schedule', 'Não especificado')}\n\n"
-                    "Antes de transferir, gostaria de confirmar: você realmente precisa falar com um atendente? "
-                    "Posso tentar te ajudar primeiro.",
+                    self._confirmation_message(tribunal_code, unit_code),
                     True,
                     200
                 )
             else:
                 # Lista tribunais disponíveis
-                tribunals_list = "\n".join([f"- {data['name']}" for data in self.tribunals.values()])
                 return (
                     "Desculpe, não identifiquei qual tribunal você deseja. "
                     "Por favor, escolha um dos seguintes tribunais:\n"
-                    f"{tribunals_list}",
+                    f"{self.directory.current.tribunal_list}",
                     True,
                     200
                 )
@@ -119,15 +90,14 @@ class HumanService(BaseService):
             if self._is_affirmative(text):
                 try:
                     # Criar sala no Jitsi
-                    tribunal_data = self.tribunals[state["tribunal_code"]]
-                    unit_data = tribunal_data['units'].get(state["unit_code"], {})
-                    subject = f"Atendimento {unit_data.get('name', tribunal_data['name'])}"
+                    entry = self.directory.current.entry(state["tribunal_code"], state["unit_code"])
+                    subject = f"Atendimento {entry.name}"
                     
                     # Limpar estado
                     self.clear_user_state(user_id)
                     
                     return (
-                        f"Entendi! Vou conectar você a um atendente da {unit_data.get('name', tribunal_data['name'])}. "
+                        f"Entendi! Vou conectar você a um atendente da {entry.name}. "
                         f"Um atendente entrará na sala em instantes.\n",
                         True,
                         205  # Transferência para atendente humano
@@ -156,7 +126,7 @@ class HumanService(BaseService):
                 )
         
         # Se é uma nova solicitação de atendente
-        if self._is_transfer_request(text):
+        if self._is_transfer_request(text, hits):
             # Verifica se mencionou algum tribunal específico
             tribunal_code, unit_code = self._get_tribunal_from_text(text)
             if tribunal_code:
@@ -164,21 +134,13 @@ class HumanService(BaseService):
                 state["unit_code"] = unit_code
                 state["waiting_for_confirmation"] = True
                 
-                tribunal_data = self.tribunals[tribunal_code]
-                unit_data = tribunal_data['units'].get(unit_code, {})
-                
                 return (
-                    f"Entendi que você quer falar com um atendente da {unit_data.get('name', tribunal_data['name'])}.\n"
-                    f"Horário de atendimento: {unit_data.get('schedule', 'Não especificado')}\n\n"
-                    "Antes de transferir, gostaria de confirmar: você realmente precisa falar com um atendente? "
-                    "Posso tentar te ajudar primeiro.",
+                    self._confirmation_message(tribunal_code, unit_code),
                     True,
                     200
                 )
             else:
                 state["waiting_for_tribunal"] = True
-                # Lista tribunais disponíveis
-                tribunals_list = "\n".join([f"- {data['name']}" for data in self.tribunals.values()])
                 return (
                     "Entendi que você gostaria de falar com um atendente humano. "
                     "Por favor, qual tribunal você deseja falar?:\n",
@@ -188,9 +150,9 @@ class HumanService(BaseService):
         
         return "", False, 200
     
-    def _is_transfer_request(self, text: str) -> bool:
+    def _is_transfer_request(self, text: str, hits: Optional[Set[str]] = None) -> bool:
         """Verifica se o texto é uma solicitação de transferência"""
-        return any(keyword in text.lower() for keyword in self.keywords)
+        return 'human:transfer' in self.find_keywords(text, hits)
     
     def _is_affirmative(self, text: str) -> bool:
         """Verifica se a resposta é afirmativa"""
@@ -202,7 +164,7 @@ class HumanService(BaseService):
         negatives = ['não', 'nao', 'n', 'no', 'não quero', 'nao quero']
         return text.lower() in negatives
     
-    def _is_in_transfer_conversation(self) -> bool:
-        """Verifica se está em uma conversa de transferência"""
-        return any(state.get("waiting_for_confirmation", False) or state.get("waiting_for_tribunal", False)
-                  for state in self.conversation_state.values()) 
\ No newline at end of file
+    def is_in_flow(self, user_id: str) -> bool:
+        """Verifica se o usuário está em uma conversa de transferência"""
+        state = self.conversation_state.get(user_id, {})
+        return state.get("waiting_for_confirmation", False) or state.get("waiting_for_tribunal", False) 
\ No newline at end of file
@@ -0,0 +1,80 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class KeywordMatcher:
+    """
+    Localiza várias palavras-chave de uma vez usando o autômato de Aho-Corasick.
+
+    Cada palavra-chave pertence a um rótulo (ex.: "process:query"); `find`
+    percorre o texto normalizado uma única vez e retorna todos os rótulos
+    cujas palavras-chave aparecem como substring, com a mesma semântica de
+    `any(keyword in text.lower() for keyword in keywords)`.
+    """
+
+    def __init__(self, groups: Optional[Dict[str, Iterable[str]]] = None):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+        self._built = True
+        for label, keywords in (groups or {}).items():
+            self.add(label, keywords)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalização aplicada às palavras-chave e aos textos consultados"""
+        return text.lower()
+
+    def add(self, label: str, keywords: Iterable[str]):
+        """Adiciona palavras-chave associadas a um rótulo"""
+        for keyword in keywords:
+            keyword = self.normalize(keyword)
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state].add(label)
+        self._built = False
+
+    def build(self):
+        """Calcula os links de falha do autômato (chamado automaticamente por `find`)"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+        self._built = True
+
+    def find(self, text: str) -> Set[str]:
+        """Retorna os rótulos de todas as palavras-chave presentes no texto"""
+        if not self._built:
+            self.build()
+
+        goto, fail, output = self._goto, self._fail, self._output
+        hits: Set[str] = set()
+        state = 0
+        for char in self.normalize(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                hits |= output[state]
+        return hits
@@ -0,0 +1,365 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Número CNJ com ou sem pontuação: NNNNNNN-DD.AAAA.J.TR.OOOO
+PROCESS_NUMBER_PATTERN = re.compile(r'(?<!\d)(\d{7})-?(\d{2})\.?(\d{4})\.?(\d)\.?(\d{2})\.?(\d{4})(?!\d)')
+
+# Código TR da Justiça Estadual (J=8) -> sigla do tribunal, conforme a Resolução CNJ 65/2008
+STATE_COURTS = {
+    '01': 'TJAC', '02': 'TJAL', '03': 'TJAP', '04': 'TJAM', '05': 'TJBA', '06': 'TJCE',
+    '07': 'TJDFT', '08': 'TJES', '09': 'TJGO', '10': 'TJMA', '11': 'TJMT', '12': 'TJMS',
+    '13': 'TJMG', '14': 'TJPA', '15': 'TJPB', '16': 'TJPR', '17': 'TJPE', '18': 'TJPI',
+    '19': 'TJRJ', '20': 'TJRN', '21': 'TJRS', '22': 'TJRO', '23': 'TJRR', '24': 'TJSC',
+    '25': 'TJSE', '26': 'TJSP', '27': 'TJTO',
+}
+
+
+def extract_process_number(text: str) -> Optional[str]:
+    """Extrai o primeiro número CNJ do texto, como 20 dígitos"""
+    match = PROCESS_NUMBER_PATTERN.search(text)
+    return ''.join(match.groups()) if match else None
+
+
+def validate_process_number(process_number: str) -> bool:
+    """
+    Verifica os dígitos verificadores (módulo 97, ISO 7064) de um número CNJ de
+    20 dígitos: NNNNNNN AAAA J TR OOOO seguido de DD deve deixar resto 1
+    """
+    if not process_number or not re.fullmatch(r'\d{20}', process_number):
+        return False
+    rearranged = process_number[:7] + process_number[9:] + process_number[7:9]
+    return int(rearranged) % 97 == 1
+
+
+def format_process_number(process_number: str) -> str:
+    """20 dígitos -> NNNNNNN-DD.AAAA.J.TR.OOOO"""
+    n = process_number
+    return f"{n[:7]}-{n[7:9]}.{n[9:13]}.{n[13]}.{n[14:16]}.{n[16:]}"
+
+
+def court_alias(process_number: str) -> Optional[str]:
+    """Sigla do tribunal a partir dos segmentos J e TR do número"""
+    segment, court = process_number[13], process_number[14:16]
+    if segment == '8':
+        return STATE_COURTS.get(court)
+    if segment == '4':
+        return f"TRF{int(court)}"
+    if segment == '5':
+        return f"TRT{int(court)}"
+    return None
+
+
+class ProcessNotFound(Exception):
+    """O processo não existe no tribunal consultado"""
+    pass
+
+
+class LookupUnavailable(Exception):
+    """A consulta não pôde ser feita (tribunal lento, fora do ar ou circuito aberto)"""
+    pass
+
+
+class CircuitOpen(LookupUnavailable):
+    """O circuito está aberto e a consulta nem chega a ser enviada"""
+    pass
+
+
+class StubProcessBackend:
+    """Backend local com dados simulados, usado quando nenhuma API é configurada"""
+
+    def lookup(self, process_number: str) -> dict:
+        return {
+            "numero": format_process_number(process_number),
+            "classe": "Procedimento Comum",
+            "assunto": "Direito Civil",
+            "status": "Em andamento",
+            "ultima_movimentacao": "2024-03-20",
+            "tribunal": court_alias(process_number) or "TJSP"
+        }
+
+
+class DataJudBackend:
+    """
+    Consulta a API pública do DataJud (CNJ) ou um servidor compatível
+    (ver `mock_server/datajud_api.py`).
+
+    Cada tribunal tem um índice próprio (`api_publica_<sigla>`), escolhido pelos
+    segmentos J e TR do número. As conexões ficam em uma `requests.Session`
+    com pool de `pool_size` conexões keep-alive, compartilhada pelas threads.
+    """
+
+    def __init__(self, base_url: str, api_key: str = "", timeout: float = 3.0, pool_size: int = 10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f"APIKey {api_key}"
+
+    def lookup(self, process_number: str) -> dict:
+        alias = court_alias(process_number)
+        if alias is None:
+            raise ProcessNotFound(f"Tribunal não suportado para o processo {process_number}")
+
+        response = self.session.post(
+            f"{self.base_url}/api_publica_{alias.lower()}/_search",
+            json={"query": {"match": {"numeroProcesso": process_number}}},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        hits = response.json().get('hits', {}).get('hits', [])
+        if not hits:
+            raise ProcessNotFound(f"Processo {process_number} não encontrado no {alias}")
+        return self._to_process_info(hits[0]['_source'], alias)
+
+    @staticmethod
+    def _to_process_info(source: dict, alias: str) -> dict:
+        movements = sorted(source.get('movimentos') or [], key=lambda movement: movement.get('dataHora', ''))
+        last_movement = movements[-1] if movements else {}
+        subjects = source.get('assuntos') or [{}]
+        return {
+            "numero": format_process_number(source.get('numeroProcesso', '')),
+            "classe": (source.get('classe') or {}).get('nome', 'Não informada'),
+            "assunto": subjects[0].get('nome', 'Não informado'),
+            "status": last_movement.get('nome', 'Sem movimentações'),
+            "ultima_movimentacao": (last_movement.get('dataHora') or source.get('dataHoraUltimaAtualizacao') or '')[:10],
+            "tribunal": source.get('tribunal', alias)
+        }
+
+
+class CircuitBreaker:
+    """
+    Interrompe as chamadas a um backend que está falhando.
+
+    Após `failure_threshold` falhas seguidas (erros ou chamadas mais lentas
+    que `slow_call_seconds`), o circuito abre e as chamadas falham na hora
+    com CircuitOpen, sem ocupar as threads de atendimento. Depois de
+    `reset_timeout` segundos uma única chamada de teste é liberada: se der
+    certo o circuito fecha, senão volta a abrir. Exceções em `ignored`
+    (ex.: processo inexistente) não contam como falha.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 slow_call_seconds: Optional[float] = None, ignored: Tuple[type, ...] = ()):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.ignored = ignored
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def call(self, func: Callable, *args):
+        with self._lock:
+            if self._opened_at is not None:
+                if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpen("Circuito aberto: consultas suspensas temporariamente")
+                self._probing = True
+
+        start = time.monotonic()
+        try:
+            result = func(*args)
+        except self.ignored:
+            self._record(success=True)
+            raise
+        except Exception:
+            self._record(success=False)
+            raise
+        slow = self.slow_call_seconds is not None and time.monotonic() - start > self.slow_call_seconds
+        self._record(success=not slow)
+        return result
+
+    def _record(self, success: bool):
+        with self._lock:
+            if success:
+                self._failures = 0
+                self._opened_at = None
+            else:
+                self._failures += 1
+                if self._probing or self._failures >= self.failure_threshold:
+                    if self._opened_at is None or self._probing:
+                        self.opened += 1
+                    self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class ProcessLookup:
+    """
+    Consulta de processos com validação local, cache e proteção do backend.
+
+    - Números com dígitos verificadores inválidos nem chegam ao backend;
+    - resultados ficam em cache por `cache_ttl` segundos (processos não
+      encontrados por `not_found_ttl`), em um LRU de `cache_size` entradas;
+    - consultas simultâneas ao mesmo número são agrupadas: só a primeira vai
+      ao backend e as demais aguardam o mesmo resultado (até `wait_timeout`);
+    - as chamadas passam por um CircuitBreaker.
+    """
+
+    def __init__(self, backend, breaker: Optional[CircuitBreaker] = None, cache_ttl: float = 300,
+                 not_found_ttl: float = 60, cache_size: int = 10000, wait_timeout: float = 10.0):
+        self.backend = backend
+        self.breaker = breaker or CircuitBreaker(ignored=(ProcessNotFound,))
+        self.cache_ttl = cache_ttl
+        self.not_found_ttl = not_found_ttl
+        self.cache_size = cache_size
+        self.wait_timeout = wait_timeout
+        self._cache: "OrderedDict[str, Tuple[float, Optional[dict]]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.failures = 0
+
+    def _cached(self, process_number: str) -> Tuple[bool, Optional[dict]]:
+        """Retorna (encontrado no cache, dados ou None para processo inexistente)"""
+        with self._lock:
+            item = self._cache.get(process_number)
+            if item is None:
+                return False, None
+            if item[0] <= time.monotonic():
+                del self._cache[process_number]
+                return False, None
+            self._cache.move_to_end(process_number)
+            self.cache_hits += 1
+            return True, item[1]
+
+    def _store(self, process_number: str, info: Optional[dict]):
+        ttl = self.cache_ttl if info is not None else self.not_found_ttl
+        if not self.cache_size or ttl <= 0:
+            return
+        with self._lock:
+            self._cache[process_number] = (time.monotonic() + ttl, info)
+            self._cache.move_to_end(process_number)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def lookup(self, process_number: str) -> dict:
+        """
+        Retorna os dados do processo. Levanta ValueError para números inválidos,
+        ProcessNotFound se o processo não existe e LookupUnavailable se o
+        backend não respondeu
+        """
+        if not validate_process_number(process_number):
+            raise ValueError(f"Número de processo inválido: {process_number}")
+
+        found, info = self._cached(process_number)
+        if found:
+            if info is None:
+                raise ProcessNotFound(f"Processo {process_number} não encontrado")
+            return info
+
+        with self._lock:
+            future = self._inflight.get(process_number)
+            leader = future is None
+            if leader:
+                future = self._inflight[process_number] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._fetch(process_number, future)
+        try:
+            return future.result(timeout=self.wait_timeout)
+        except FutureTimeoutError:
+            raise LookupUnavailable(f"Tempo esgotado aguardando a consulta do processo {process_number}")
+
+    def _fetch(self, process_number: str, future: Future):
+        try:
+            info = self.breaker.call(self.backend.lookup, process_number)
+            self._store(process_number, info)
+            future.set_result(info)
+        except ProcessNotFound as e:
+            self._store(process_number, None)
+            future.set_exception(e)
+        except LookupUnavailable as e:
+            self._count_failure()
+            future.set_exception(e)
+        except Exception as e:
+            self._count_failure()
+            logger.warning(f"Falha na consulta do processo {process_number}: {str(e)}")
+            future.set_exception(LookupUnavailable(str(e)))
+        finally:
+            with self._lock:
+                self._inflight.pop(process_number, None)
+
+    def _count_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {
+                'cached': len(self._cache),
+                'cache_hits': self.cache_hits,
+                'coalesced': self.coalesced,
+                'misses': self.misses,
+                'failures': self.failures,
+            }
+        return {
+            'backend': type(self.backend).__name__,
+            'circuit': self.breaker.state,
+            **counters,
+            'rejected': self.breaker.rejected,
+        }
+
+
+def create_process_lookup() -> ProcessLookup:
+    """
+    Cria a consulta de processos configurada em PROCESS_LOOKUP_BACKEND:
+    `stub` (padrão, dados simulados) ou `datajud` (DATAJUD_URL e DATAJUD_API_KEY)
+    """
+    backend_name = os.getenv('PROCESS_LOOKUP_BACKEND', 'stub')
+    timeout = float(os.getenv('PROCESS_LOOKUP_TIMEOUT_SECONDS', '3'))
+    if backend_name == 'stub':
+        backend = StubProcessBackend()
+    elif backend_name == 'datajud':
+        backend = DataJudBackend(
+            os.getenv('DATAJUD_URL', 'https://api-publica.datajud.cnj.jus.br'),
+            api_key=os.getenv('DATAJUD_API_KEY', ''),
+            timeout=timeout,
+            pool_size=int(os.getenv('PROCESS_LOOKUP_POOL_SIZE', '10'))
+        )
+    else:
+        raise ValueError(f"PROCESS_LOOKUP_BACKEND inválido: {backend_name}")
+
+    breaker = CircuitBreaker(
+        failure_threshold=int(os.getenv('PROCESS_BREAKER_FAILURES', '5')),
+        reset_timeout=float(os.getenv('PROCESS_BREAKER_RESET_SECONDS', '30')),
+        slow_call_seconds=timeout,
+        ignored=(ProcessNotFound,)
+    )
+    return ProcessLookup(
+        backend,
+        breaker,
+        cache_ttl=float(os.getenv('PROCESS_CACHE_TTL_SECONDS', '300')),
+        cache_size=int(os.getenv('PROCESS_CACHE_SIZE', '10000')),
+        wait_timeout=timeout * 2
+    )
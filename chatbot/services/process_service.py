@@ -1,14 +1,17 @@
-import re
-from typing import Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from .base_service import BaseService
+from .process_lookup import (
+    LookupUnavailable, ProcessLookup, ProcessNotFound, create_process_lookup,
+    extract_process_number, format_process_number, validate_process_number
+)
 
 class ProcessService(BaseService):
     """Serviço para consulta de processos judiciais"""
     
-    def __init__(self):
+    def __init__(self, lookup: Optional[ProcessLookup] = None):
         super().__init__()
-        # Padrão para identificar números de processos no formato CNJ
-        self.process_pattern = r'\d{20}'
+        # Consulta ao tribunal (com cache, agrupamento de consultas e circuit breaker)
+        self.lookup = lookup or create_process_lookup()
         # Palavras-chave para identificar consultas de processo
         self.keywords = [
             'consultar processo',
@@ -30,22 +33,26 @@ class ProcessService(BaseService):
             'cancelar consulta'
         ]
     
-    def can_handle(self, text: str) -> bool:
+    def keyword_groups(self) -> Dict[str, List[str]]:
+        """Palavras-chave de consulta e de cancelamento"""
+        return {
+            'process:query': self.keywords,
+            'process:cancel': self.cancel_commands
+        }
+    
+    def can_handle(self, text: str, hits: Optional[Set[str]] = None) -> bool:
         """Verifica se o texto é uma consulta de processo"""
-        # Verifica se está em uma conversa de processo
-        if self._is_in_process_conversation():
-            return True
-        # Verifica se contém palavras-chave de processo
-        return any(keyword in text.lower() for keyword in self.keywords)
+        return self._is_process_query(text, hits)
     
-    def handle(self, user_id: str, text: str) -> Tuple[str, bool, int]:
+    def handle(self, user_id: str, text: str, hits: Optional[Set[str]] = None) -> Tuple[str, bool, int]:
         """Processa a consulta de processo"""
         state = self.get_user_state(user_id)
+        hits = self.find_keywords(text, hits)
         
         # Se já está esperando o número do processo
         if state.get("waiting_for_process"):
             # Verifica se é um comando de cancelamento
-            if self._is_cancel_command(text):
+            if self._is_cancel_command(text, hits):
                 self.clear_user_state(user_id)
                 return "Consulta de processo cancelada. Como posso ajudar?", False, 200
                 
@@ -53,8 +60,22 @@ class ProcessService(BaseService):
             if process_number and self._validate_process_number(process_number):
                 # Limpa o estado da conversa
                 self.clear_user_state(user_id)
-                # Simula a consulta do processo
-                process_info = self._get_process_info(process_number)
+                try:
+                    process_info = self._get_process_info(process_number)
+                except ProcessNotFound:
+                    return (
+                        f"Não encontrei o processo {format_process_number(process_number)}. "
+                        "Confira o número e tente novamente.",
+                        False,
+                        200
+                    )
+                except LookupUnavailable:
+                    return (
+                        "O serviço de consulta processual está indisponível no momento. "
+                        "Por favor, tente novamente em alguns minutos.",
+                        False,
+                        200
+                    )
                 return (
                     f"Processo encontrado!\n"
                     f"Número: {process_info['numero']}\n"
@@ -76,51 +97,35 @@ class ProcessService(BaseService):
                 )
         
         # Se é uma nova consulta de processo
-        if self._is_process_query(text):
+        if self._is_process_query(text, hits):
             state["waiting_for_process"] = True
             return "Por favor, informe o número do processo que deseja consultar. Digite 'cancelar' ou 'sair' para sair da consulta.", True, 200
         
         return "", False, 200
     
-    def _is_process_query(self, text: str) -> bool:
+    def _is_process_query(self, text: str, hits: Optional[Set[str]] = None) -> bool:
         """Verifica se o texto é uma consulta de processo"""
-        return any(keyword in text.lower() for keyword in self.keywords)
+        return 'process:query' in self.find_keywords(text, hits)
     
     def _extract_process_number(self, text: str) -> str:
-        """Extrai o número do processo do texto"""
-        match = re.search(self.process_pattern, text)
-        return match.group(0) if match else None
+        """Extrai o número do processo do texto (com ou sem pontuação)"""
+        return extract_process_number(text)
     
     def _validate_process_number(self, process_number: str) -> bool:
-        """Valida se o número do processo está no formato correto"""
-        if not process_number:
-            return False
-        # Verifica se tem 20 dígitos
-        if not re.match(r'^\d{20}$', process_number):
-            return False
-        # Aqui você pode adicionar mais validações específicas do CNJ
-        return True
+        """Valida o formato e os dígitos verificadores (módulo 97) do número CNJ"""
+        return validate_process_number(process_number)
     
     def _get_process_info(self, process_number: str) -> dict:
         """
-        Simula a consulta de um processo.
-        Em um cenário real, aqui você faria a integração com a API do CNJ
+        Consulta o processo no tribunal.
+        Levanta ProcessNotFound ou LookupUnavailable
         """
-        # Simulação de resposta
-        return {
-            "numero": process_number,
-            "classe": "Procedimento Comum",
-            "assunto": "Direito Civil",
-            "status": "Em andamento",
-            "ultima_movimentacao": "2024-03-20",
-            "tribunal": "TJSP"
-        }
+        return self.lookup.lookup(process_number)
     
-    def _is_in_process_conversation(self) -> bool:
-        """Verifica se está em uma conversa de processo"""
-        return any(state.get("waiting_for_process", False) 
-                  for state in self.conversation_state.values())
+    def is_in_flow(self, user_id: str) -> bool:
+        """Verifica se o usuário está em uma conversa de processo"""
+        return self.conversation_state.get(user_id, {}).get("waiting_for_process", False)
     
-    def _is_cancel_command(self, text: str) -> bool:
+    def _is_cancel_command(self, text: str, hits: Optional[Set[str]] = None) -> bool:
         """Verifica se o texto é um comando de cancelamento"""
-        return any(command in text.lower() for command in self.cancel_commands) 
\ No newline at end of file
+        return 'process:cancel' in self.find_keywords(text, hits) 
\ No newline at end of file
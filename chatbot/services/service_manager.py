@@ -1,25 +1,119 @@
-from typing import List, Tuple
+import copy
+import os
+from typing import Dict, List, Optional, Set, Tuple
 from .base_service import BaseService
+from .keyword_matcher import KeywordMatcher
+from monitoring.metrics import SERVICE_LATENCY
+from state.store import MemoryStateStore, StateStore
 
 class ServiceManager:
-    """Gerencia todos os serviços disponíveis no chatbot"""
-    
-    def __init__(self):
+    """
+    Gerencia todos os serviços disponíveis no chatbot
+
+    O estado de cada usuário (serviço com fluxo ativo e estado de cada serviço)
+    fica em um único registro no StateStore, lido uma vez no início e gravado
+    uma vez no fim de cada mensagem, o que permite atender o mesmo usuário a
+    partir de qualquer réplica quando o backend é compartilhado (Redis).
+    """
+
+    def __init__(self, store: Optional[StateStore] = None, state_ttl: Optional[int] = None):
         self.services: List[BaseService] = []
-    
+        self.services_by_name: Dict[str, BaseService] = {}
+        self.matcher = KeywordMatcher()
+        self.store = store or MemoryStateStore()
+        self.state_ttl = state_ttl or int(os.getenv('STATE_TTL_SECONDS', '3600'))
+
     def register_service(self, service: BaseService):
         """Registra um novo serviço"""
         self.services.append(service)
-        
+        self.services_by_name[service.name] = service
+        self._build_matcher()
+
+    def _build_matcher(self):
+        """Compila as palavras-chave de todos os serviços em um único matcher"""
+        matcher = KeywordMatcher()
+        for service in self.services:
+            for label, keywords in service.keyword_groups().items():
+                matcher.add(label, keywords)
+        matcher.build()
+        self.matcher = matcher
+
+    @staticmethod
+    def _user_key(user_id: str) -> str:
+        return f"user:{user_id}"
+
+    def _load_user(self, user_id: str) -> dict:
+        """Lê o registro do usuário e carrega o estado de cada serviço"""
+        record = self.store.get(self._user_key(user_id)) or {}
+        for name, state in record.get('services', {}).items():
+            service = self.services_by_name.get(name)
+            if service is not None:
+                service.conversation_state[user_id] = state
+        return record
+
+    def _save_user(self, user_id: str, record: dict, original: dict):
+        """Grava o registro do usuário, apenas se mudou em relação ao `original` lido"""
+        services = {}
+        for service in self.services:
+            state = service.conversation_state.pop(user_id, None)
+            if state:
+                services[service.name] = state
+
+        updated = {key: value for key, value in record.items() if key != 'services'}
+        if services:
+            updated['services'] = services
+
+        if updated == original:
+            return
+        if updated:
+            self.store.set(self._user_key(user_id), updated, ttl=self.state_ttl)
+        else:
+            self.store.delete(self._user_key(user_id))
+
     def handle_message(self, user_id: str, text: str) -> Tuple[str, bool, int]:
         """
         Processa a mensagem através de todos os serviços registrados
         Retorna a primeira resposta não vazia ou uma resposta vazia se nenhum serviço puder lidar
         """
+        # Uma única passada pelo texto encontra as palavras-chave de todos os serviços
+        hits = self.matcher.find(text)
+
+        record = self._load_user(user_id)
+        original = copy.deepcopy(record)
+        try:
+            return self._dispatch(user_id, text, hits, record)
+        finally:
+            self._save_user(user_id, record, original)
+
+    def _dispatch(self, user_id: str, text: str, hits: Set[str], record: dict) -> Tuple[str, bool, int]:
+        """Encaminha a mensagem para o serviço com fluxo ativo ou para o primeiro que puder lidar"""
+        # Se o usuário está no meio de um fluxo, só o serviço responsável é consultado
+        active_service = self.services_by_name.get(record.get('route'))
+        if active_service is not None:
+            with SERVICE_LATENCY.time(service=active_service.name):
+                response, continue_conversation, status = active_service.handle(user_id, text, hits)
+            self._update_route(user_id, active_service, record)
+            return response, continue_conversation, status
+
         for service in self.services:
-            if service.can_handle(text):
-                response, continue_conversation, status = service.handle(user_id, text)
+            if service.can_handle(text, hits):
+                with SERVICE_LATENCY.time(service=service.name):
+                    response, continue_conversation, status = service.handle(user_id, text, hits)
+                self._update_route(user_id, service, record)
                 if response:
                     return response, continue_conversation, status
-        
-        return "", False, 200
\ No newline at end of file
+
+        return "", False, 200
+
+    def _update_route(self, user_id: str, service: BaseService, record: dict):
+        """Atualiza o serviço com fluxo ativo após o serviço processar a mensagem"""
+        if service.is_in_flow(user_id):
+            record['route'] = service.name
+        elif record.get('route') == service.name:
+            del record['route']
+
+    def clear_user(self, user_id: str):
+        """Encerra qualquer fluxo em andamento e limpa o estado do usuário em todos os serviços"""
+        self.store.delete(self._user_key(user_id))
+        for service in self.services:
+            service.clear_user_state(user_id)
@@ -0,0 +1,201 @@
+import json
+import logging
+import os
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+
+def fold(text: str) -> str:
+    """Minúsculas e sem acentos ("Três Lagoas" -> "tres lagoas")"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class FoldedKeywordMatcher(KeywordMatcher):
+    """KeywordMatcher que ignora acentos nas palavras-chave e no texto"""
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return fold(text)
+
+
+class TribunalEntry(NamedTuple):
+    """Nome e horário já formatados de um tribunal ou unidade"""
+    name: str
+    schedule: str
+
+
+class CompiledDirectory:
+    """
+    Diretório de tribunais pronto para consulta, imutável após construído.
+
+    As palavras-chave de todos os tribunais e unidades ficam em um único
+    matcher cujos rótulos são (tribunal, unidade), com unidade "" para o
+    próprio tribunal. Códigos de unidade também são normalizados sem
+    acentos, então "três_lagoas" nas palavras-chave e "tres_lagoas" nas
+    unidades são a mesma unidade.
+    """
+
+    def __init__(self, tribunals: List[dict], signature: tuple = ()):
+        self.signature = signature
+        self.matcher = FoldedKeywordMatcher()
+        self.entries: Dict[Tuple[str, str], TribunalEntry] = {}
+        # Ordem de verificação: tribunais e, dentro de cada um, suas unidades
+        self.order: List[Tuple[str, List[str]]] = []
+
+        for tribunal in tribunals:
+            code = fold(tribunal['code'])
+            self.entries[(code, "")] = TribunalEntry(tribunal['name'], 'Não especificado')
+            for unit_code, unit in tribunal.get('units', {}).items():
+                self.entries[(code, fold(unit_code))] = TribunalEntry(
+                    unit.get('name', tribunal['name']),
+                    unit.get('schedule', 'Não especificado')
+                )
+
+            units = []
+            for unit_code, keywords in tribunal['keywords'].items():
+                unit_code = fold(unit_code)
+                if unit_code == code:
+                    self.matcher.add((code, ""), keywords)
+                else:
+                    self.matcher.add((code, unit_code), keywords)
+                    units.append(unit_code)
+            self.order.append((code, units))
+
+        self.matcher.build()
+        self.tribunal_list = "\n".join(f"- {tribunal['name']}" for tribunal in tribunals)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def find(self, text: str) -> Tuple[str, str]:
+        """
+        Identifica o tribunal e a unidade mencionados no texto.
+        Retorna (tribunal, unidade), (tribunal, "") ou ("", "")
+        """
+        hits = self.matcher.find(text)
+        if not hits:
+            return "", ""
+        for code, units in self.order:
+            if (code, "") in hits:
+                for unit_code in units:
+                    if (code, unit_code) in hits:
+                        return code, unit_code
+                return code, ""
+        return "", ""
+
+    def entry(self, tribunal_code: str, unit_code: str = "") -> TribunalEntry:
+        """Nome e horário da unidade (ou do tribunal, se a unidade não existir)"""
+        return (
+            self.entries.get((tribunal_code, unit_code))
+            or self.entries.get((tribunal_code, ""))
+            or TribunalEntry(tribunal_code.upper(), 'Não especificado')
+        )
+
+
+class TribunalDirectory:
+    """
+    Carrega os arquivos `*.json` de `config_dir` em um CompiledDirectory e o
+    recompila em segundo plano quando algum arquivo é criado, alterado ou
+    removido (verificação por mtime e tamanho, ver `start_watcher`).
+
+    A nova versão é construída por completo antes de substituir a atual com
+    uma única atribuição, então as consultas (`current`) não usam lock e
+    nunca veem um diretório pela metade. Se um arquivo estiver inválido (por
+    exemplo, lido no meio de uma gravação), a última versão válida dele é
+    mantida com um aviso no log; um arquivo que nunca foi válido é ignorado.
+    """
+
+    def __init__(self, config_dir: Path = Path("config/tribunals")):
+        self.config_dir = Path(config_dir)
+        self.reloads = 0
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        # Última versão válida de cada arquivo, reaproveitada se ele ficar inválido
+        self._last_good: Dict[str, dict] = {}
+        self.current = self._compile(self._signature())
+
+    def _signature(self) -> tuple:
+        if not self.config_dir.exists():
+            return ()
+        signature = []
+        for json_file in sorted(self.config_dir.glob("*.json")):
+            try:
+                stat = json_file.stat()
+            except FileNotFoundError:
+                continue
+            signature.append((json_file.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _compile(self, signature: tuple) -> CompiledDirectory:
+        if not self.config_dir.exists():
+            logger.warning(f"Diretório de configuração não encontrado: {self.config_dir}")
+
+        tribunals, last_good = [], {}
+        for name, _, _ in signature:
+            json_file = self.config_dir / name
+            try:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    tribunal = json.load(f)
+                # Valida a estrutura antes de incluir o arquivo no diretório
+                CompiledDirectory([tribunal])
+            except Exception as e:
+                tribunal = self._last_good.get(name)
+                if tribunal is None:
+                    logger.warning(f"Erro ao carregar arquivo {json_file}: {str(e)}")
+                    continue
+                logger.warning(f"Erro ao carregar arquivo {json_file}, mantida a última versão válida: {str(e)}")
+            last_good[name] = tribunal
+            tribunals.append(tribunal)
+        compiled = CompiledDirectory(tribunals, signature)
+        self._last_good = last_good
+        return compiled
+
+    def reload_if_changed(self) -> bool:
+        """Recompila o diretório se algum arquivo mudou; retorna True se recompilou"""
+        signature = self._signature()
+        if signature == self.current.signature:
+            return False
+        self.current = self._compile(signature)
+        self.reloads += 1
+        logger.info(f"Diretório de tribunais recarregado: {len(self.current)} tribunais")
+        return True
+
+    def start_watcher(self, interval: float = 30.0):
+        """Verifica os arquivos a cada `interval` segundos em uma thread daemon"""
+        if self._watcher is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    logger.error(f"Erro ao recarregar o diretório de tribunais: {str(e)}")
+
+        self._watcher = threading.Thread(target=run, name="tribunal-directory", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+
+def create_tribunal_directory() -> TribunalDirectory:
+    """
+    Cria o diretório a partir de TRIBUNALS_DIR (padrão config/tribunals) e
+    inicia a recarga automática a cada TRIBUNALS_RELOAD_SECONDS (0 desativa)
+    """
+    directory = TribunalDirectory(Path(os.getenv('TRIBUNALS_DIR', 'config/tribunals')))
+    interval = float(os.getenv('TRIBUNALS_RELOAD_SECONDS', '30'))
+    if interval > 0:
+        directory.start_watcher(interval)
+    return directory
@@ -0,0 +1,13 @@
+import os
+
+import redis
+
+
+def create_redis_client(**options) -> redis.Redis:
+    """
+    Cria o cliente Redis compartilhado a partir das variáveis de ambiente.
+    `options` são repassadas ao redis.Redis (ex.: socket_timeout)
+    """
+    redis_host = os.getenv("REDIS_HOST", "redis")
+    redis_port = int(os.getenv("REDIS_PORT", "6379"))
+    return redis.Redis(host=redis_host, port=redis_port, decode_responses=True, **options)
@@ -0,0 +1,257 @@
+import copy
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StateStore(ABC):
+    """
+    Armazenamento chave-valor do estado de conversa e das sessões.
+
+    Os valores são dicionários serializáveis em JSON. As operações em lote
+    (`get_many`, `set_many`, `delete_many`) permitem que cada requisição leia
+    e grave todo o estado do usuário com uma ida ao backend em cada sentido.
+    """
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> List[Optional[dict]]:
+        """Retorna os valores das chaves (None para as inexistentes ou expiradas)"""
+        pass
+
+    @abstractmethod
+    def set_many(self, values: Dict[str, dict], ttl: Optional[int] = None):
+        """Grava vários valores, com expiração opcional em segundos"""
+        pass
+
+    @abstractmethod
+    def delete_many(self, keys: List[str]):
+        """Remove várias chaves"""
+        pass
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.get_many([key])[0]
+
+    def set(self, key: str, value: dict, ttl: Optional[int] = None):
+        self.set_many({key: value}, ttl)
+
+    def delete(self, key: str):
+        self.delete_many([key])
+
+    def add_eviction_listener(self, listener: Callable[[str], None]):
+        """
+        Registra uma função chamada com a chave sempre que o backend descarta
+        uma chave por expiração ou capacidade. Backends com expiração nativa
+        (Redis) não notificam.
+        """
+        pass
+
+    def stats(self) -> dict:
+        """Contadores do backend (chaves vivas, remoções, memória estimada)"""
+        return {}
+
+
+class MemoryStateStore(StateStore):
+    """
+    Backend em memória do processo (padrão para execução local e CLI).
+
+    As expirações ficam em um heap de (instante, chave) e são removidas por um
+    varredor periódico (`start_sweeper`), de modo que usuários que nunca voltam
+    não ficam para sempre na memória. `max_keys` limita o total de chaves,
+    descartando as menos usadas recentemente (LRU). Cada remoção automática é
+    avisada aos listeners registrados com `add_eviction_listener`.
+    """
+
+    def __init__(self, max_keys: int = 0):
+        self.max_keys = max_keys
+        # chave -> (valor, expira_em, tamanho estimado em bytes)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._expirations: List[tuple] = []
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+        self._memory_estimate = 0
+        self._namespaces: Counter = Counter()
+        self.evictions = Counter()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeper = threading.Event()
+
+    def add_eviction_listener(self, listener: Callable[[str], None]):
+        self._listeners.append(listener)
+
+    @staticmethod
+    def _namespace(key: str) -> str:
+        return key.split(':', 1)[0]
+
+    def _remove(self, key: str):
+        """Remove a chave atualizando os contadores (chamado com o lock adquirido)"""
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._memory_estimate -= item[2]
+            self._namespaces[self._namespace(key)] -= 1
+        return item
+
+    def _notify(self, keys: List[str]):
+        """Avisa os listeners fora do lock, pois eles podem acessar o store"""
+        for key in keys:
+            for listener in self._listeners:
+                listener(key)
+
+    def get_many(self, keys: List[str]) -> List[Optional[dict]]:
+        now = time.monotonic()
+        values, expired = [], []
+        with self._lock:
+            for key in keys:
+                item = self._data.get(key)
+                if item and item[1] is not None and item[1] <= now:
+                    self._remove(key)
+                    self.evictions['expired'] += 1
+                    expired.append(key)
+                    item = None
+                if item:
+                    self._data.move_to_end(key)
+                values.append(copy.deepcopy(item[0]) if item else None)
+        self._notify(expired)
+        return values
+
+    def set_many(self, values: Dict[str, dict], ttl: Optional[int] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        evicted = []
+        with self._lock:
+            for key, value in values.items():
+                self._remove(key)
+                size = len(key) + len(json.dumps(value))
+                self._data[key] = (copy.deepcopy(value), expires_at, size)
+                self._memory_estimate += size
+                self._namespaces[self._namespace(key)] += 1
+                if expires_at is not None:
+                    heapq.heappush(self._expirations, (expires_at, key))
+
+            while self.max_keys and len(self._data) > self.max_keys:
+                key = next(iter(self._data))
+                self._remove(key)
+                self.evictions['capacity'] += 1
+                evicted.append(key)
+
+            # Entradas antigas do heap (chaves regravadas ou removidas) são descartadas
+            if len(self._expirations) > 2 * len(self._data) + 1024:
+                self._expirations = [
+                    (item[1], key) for key, item in self._data.items() if item[1] is not None
+                ]
+                heapq.heapify(self._expirations)
+        self._notify(evicted)
+
+    def delete_many(self, keys: List[str]):
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def sweep(self) -> int:
+        """Remove todas as chaves expiradas; retorna quantas foram removidas"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            while self._expirations and self._expirations[0][0] <= now:
+                expires_at, key = heapq.heappop(self._expirations)
+                item = self._data.get(key)
+                # Ignora entradas de chaves regravadas com outra expiração
+                if item is not None and item[1] == expires_at:
+                    self._remove(key)
+                    self.evictions['expired'] += 1
+                    expired.append(key)
+        self._notify(expired)
+        return len(expired)
+
+    def start_sweeper(self, interval: float = 30.0):
+        """Inicia a varredura periódica de chaves expiradas em uma thread daemon"""
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while not self._stop_sweeper.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Erro na varredura de estado expirado: {str(e)}")
+
+        self._sweeper = threading.Thread(target=run, name="state-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop_sweeper.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'keys': len(self._data),
+                'keys_by_namespace': {name: count for name, count in self._namespaces.items() if count},
+                'evictions_expired': self.evictions['expired'],
+                'evictions_capacity': self.evictions['capacity'],
+                'memory_bytes_estimate': self._memory_estimate,
+            }
+
+
+class RedisStateStore(StateStore):
+    """
+    Backend Redis compartilhado entre réplicas.
+
+    Aceita qualquer cliente compatível com redis-py (inclusive `fakeredis`
+    em testes). Leituras usam um único MGET e escritas um pipeline.
+    """
+
+    def __init__(self, client, prefix: str = "cnj-chatbot:state:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get_many(self, keys: List[str]) -> List[Optional[dict]]:
+        if not keys:
+            return []
+        raw_values = self.client.mget([self.prefix + key for key in keys])
+        return [json.loads(raw) if raw is not None else None for raw in raw_values]
+
+    def set_many(self, values: Dict[str, dict], ttl: Optional[int] = None):
+        if not values:
+            return
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipeline.set(self.prefix + key, json.dumps(value), ex=ttl)
+        pipeline.execute()
+
+    def delete_many(self, keys: List[str]):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def stats(self) -> dict:
+        return {'backend': 'redis'}
+
+
+def create_state_store(redis_client=None, backend: Optional[str] = None) -> StateStore:
+    """
+    Cria o backend de estado informado em `backend` ou configurado em
+    STATE_BACKEND (memory ou redis). No modo redis reutiliza `redis_client`,
+    se informado. No modo memory aplica STATE_MAX_KEYS e inicia o varredor a
+    cada STATE_SWEEP_INTERVAL_SECONDS.
+    """
+    backend = backend or os.getenv("STATE_BACKEND", "memory")
+    if backend == "memory":
+        store = MemoryStateStore(max_keys=int(os.getenv("STATE_MAX_KEYS", "0")))
+        sweep_interval = float(os.getenv("STATE_SWEEP_INTERVAL_SECONDS", "30"))
+        if sweep_interval > 0:
+            store.start_sweeper(sweep_interval)
+        return store
+    if backend == "redis":
+        if redis_client is None:
+            from .redis_client import create_redis_client
+            redis_client = create_redis_client()
+        return RedisStateStore(redis_client)
+    raise ValueError(f"STATE_BACKEND inválido: {backend}")
@@ -0,0 +1,130 @@
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Iterable, List, Tuple
+
+from chatterbot.conversation import Statement
+from chatterbot.trainers import Trainer
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+class BulkListTrainer(Trainer):
+    """
+    Treina o chatbot com pares (pergunta, resposta) gravando em lote no MongoDB.
+
+    Diferente do ListTrainer, os documentos dos statements (search_text,
+    in_response_to, tags) são montados em memória e enviados em blocos com
+    `insert_many(ordered=False)`, ou como upserts quando `upsert=True`,
+    reduzindo as idas ao banco de uma por linha para uma por bloco. O
+    `search_text` de cada bloco é calculado de uma vez quando o tagger
+    aceita lotes (`nlp.tagger.PipelineTagger`).
+
+    :param chunk_size: Quantidade de statements por escrita. Padrão: TRAINING_CHUNK_SIZE ou 1000
+    :param upsert: Usa upserts idempotentes em vez de inserts. Padrão: False
+    :param tags: Tags adicionadas a todos os statements treinados
+    """
+
+    def __init__(self, chatbot, **kwargs):
+        super().__init__(chatbot, **kwargs)
+        self.chunk_size = kwargs.get('chunk_size', int(os.getenv('TRAINING_CHUNK_SIZE', '1000')))
+        self.upsert = kwargs.get('upsert', False)
+        self.tags = list(kwargs.get('tags', []))
+
+    def _search_texts(self, texts: List[str]) -> List[str]:
+        """search_text de cada texto, em lote quando o tagger permite"""
+        tagger = self.chatbot.storage.tagger
+        if hasattr(tagger, 'get_text_index_strings'):
+            return tagger.get_text_index_strings(texts)
+        return [tagger.get_text_index_string(text) for text in texts]
+
+    def _build_documents(self, pairs: List[Tuple[str, str]]) -> List[dict]:
+        """Monta os documentos da pergunta e da resposta de cada par"""
+        texts = []
+        for question, answer in pairs:
+            texts.append(self.get_preprocessed_statement(Statement(text=question)).text)
+            texts.append(self.get_preprocessed_statement(Statement(text=answer)).text)
+        search_texts = self._search_texts(texts)
+
+        documents = []
+        for index in range(0, len(texts), 2):
+            documents.append(self._build_document(texts[index], search_texts[index]))
+            documents.append(self._build_document(
+                texts[index + 1],
+                search_texts[index + 1],
+                in_response_to=texts[index],
+                search_in_response_to=search_texts[index]
+            ))
+        return documents
+
+    def _build_document(self, text: str, search_text: str, in_response_to: str = None,
+                        search_in_response_to: str = '') -> dict:
+        """Monta o documento de um statement já pré-processado"""
+        return {
+            'text': text,
+            'search_text': search_text,
+            'conversation': 'training',
+            'persona': '',
+            'tags': list(self.tags),
+            'in_response_to': in_response_to,
+            'search_in_response_to': search_in_response_to,
+            'created_at': datetime.now(timezone.utc)
+        }
+
+    def _write(self, documents: List[dict]):
+        """Grava um bloco de documentos no MongoDB"""
+        statements = self.chatbot.storage.statements
+        if self.upsert:
+            statements.bulk_write([
+                UpdateOne(
+                    {
+                        'text': document['text'],
+                        'in_response_to': document['in_response_to'],
+                        'conversation': document['conversation']
+                    },
+                    {'$setOnInsert': document},
+                    upsert=True
+                )
+                for document in documents
+            ], ordered=False)
+        else:
+            statements.insert_many(documents, ordered=False)
+
+    def train(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """
+        Treina com um iterável de pares (pergunta, resposta), consumido sob demanda.
+        Retorna a quantidade de pares treinados.
+        """
+        batch: List[Tuple[str, str]] = []
+        rows = 0
+        start = time.perf_counter()
+
+        # Cada par gera dois statements
+        pairs_per_chunk = max(self.chunk_size // 2, 1)
+        for pair in pairs:
+            batch.append(pair)
+            rows += 1
+
+            if len(batch) >= pairs_per_chunk:
+                self._write(self._build_documents(batch))
+                batch = []
+                elapsed = time.perf_counter() - start
+                logger.info(f"Treinamento em lote: {rows} linhas ({rows / elapsed:.0f} linhas/s)")
+
+        if batch:
+            self._write(self._build_documents(batch))
+
+        elapsed = time.perf_counter() - start
+        rate = rows / elapsed if elapsed else 0
+        logger.info(f"Treinamento em lote concluído: {rows} linhas em {elapsed:.2f}s ({rate:.0f} linhas/s)")
+
+        tagger = self.chatbot.storage.tagger
+        if hasattr(tagger, 'stats'):
+            training = tagger.stats()['training']
+            logger.info(
+                f"Pré-processamento do treinamento (acumulado): {training['tokens']} tokens "
+                f"({training['tokens_per_second']} tokens/s)"
+            )
+        return rows
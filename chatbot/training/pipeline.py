@@ -0,0 +1,111 @@
+import logging
+import os
+import socket
+import time
+from pathlib import Path
+from typing import Dict, Iterable
+
+from chatterbot.trainers import ChatterBotCorpusTrainer
+
+from handle_conversations import build_manifest, diff_manifest, iter_conversation_pairs
+from .bulk_trainer import BulkListTrainer
+from .snapshot import SNAPSHOT_SCHEMA_VERSION, TrainingSnapshot, compute_corpus_hash, compute_training_hash
+
+logger = logging.getLogger(__name__)
+
+
+def csv_tag(file_name: str) -> str:
+    """Tag que identifica os statements treinados a partir de um arquivo CSV"""
+    return f"csv:{file_name}"
+
+
+def train_corpus(chatbot, corpus: str):
+    """Remove todo o treinamento anterior e treina com o corpus do ChatterBot"""
+    chatbot.storage.statements.delete_many({'conversation': 'training'})
+    ChatterBotCorpusTrainer(chatbot).train(corpus)
+
+
+def train_csv_files(chatbot, csv_dir: Path, file_names: Iterable[str], removed: Iterable[str] = ()):
+    """
+    (Re)treina apenas os arquivos CSV informados: os statements de cada arquivo
+    são substituídos e os de arquivos removidos são apagados. As linhas com
+    problema de cada arquivo são resumidas no log ao final dele
+    """
+    statements = chatbot.storage.statements
+    for file_name in removed:
+        result = statements.delete_many({'conversation': 'training', 'tags': csv_tag(file_name)})
+        logger.info(f"Arquivo removido {file_name}: {result.deleted_count} statements apagados")
+
+    for file_name in file_names:
+        statements.delete_many({'conversation': 'training', 'tags': csv_tag(file_name)})
+        errors = []
+        BulkListTrainer(chatbot, tags=[csv_tag(file_name)]).train(
+            iter_conversation_pairs([file_name], csv_dir, errors)
+        )
+        if errors:
+            lines = ', '.join(str(line) for _, line, _ in errors[:10])
+            more = f" e mais {len(errors) - 10}" if len(errors) > 10 else ""
+            logger.warning(f"{file_name}: {len(errors)} linha(s) com problema ignoradas ou corrigidas (linhas {lines}{more})")
+
+
+def _train(chatbot, snapshot: TrainingSnapshot, corpus: str, corpus_hash: str,
+           csv_dir: Path, manifest: Dict[str, dict], force_training: bool):
+    """Treina o que mudou desde o snapshot atual, ou tudo quando o corpus mudou"""
+    current = snapshot.current()
+    full_training = (
+        force_training
+        or not current
+        or current.get('schema_version') != SNAPSHOT_SCHEMA_VERSION
+        or current.get('corpus_hash') != corpus_hash
+    )
+
+    if full_training:
+        logger.info("Treinamento completo: corpus e todos os arquivos CSV")
+        train_corpus(chatbot, corpus)
+        train_csv_files(chatbot, csv_dir, manifest)
+        return
+
+    changed, removed = diff_manifest(snapshot.files(current), manifest)
+    logger.info(
+        f"Treinamento incremental: {len(changed)} arquivo(s) novo(s) ou alterado(s), "
+        f"{len(removed)} removido(s)"
+    )
+    train_csv_files(chatbot, csv_dir, changed, removed)
+
+
+def ensure_trained(chatbot, corpus: str, csv_dir: Path, force_training: bool = False,
+                   wait_timeout: float = 600) -> str:
+    """
+    Garante que o MongoDB contenha o treinamento correspondente ao conteúdo atual.
+    Réplicas que encontram o snapshot pronto apenas o carregam; se outra réplica
+    estiver treinando, aguardam em vez de treinar em paralelo.
+    Retorna o hash do snapshot em uso.
+    """
+    snapshot = TrainingSnapshot(chatbot.storage.database)
+    current = snapshot.current()
+    corpus_hash = compute_corpus_hash(corpus)
+    manifest = build_manifest(csv_dir, previous=snapshot.files(current))
+    content_hash = compute_training_hash(corpus_hash, manifest)
+
+    if not force_training and current and current.get('hash') == content_hash:
+        logger.info(f"Snapshot de treinamento {content_hash[:12]} já disponível. Pulando treinamento.")
+        return content_hash
+
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    while not snapshot.acquire_lock(owner):
+        logger.info("Outra réplica está treinando o chatbot. Aguardando snapshot...")
+        if not force_training and snapshot.wait_for(content_hash, timeout=wait_timeout):
+            logger.info(f"Snapshot de treinamento {content_hash[:12]} carregado.")
+            return content_hash
+        time.sleep(1)
+
+    try:
+        with snapshot.hold_lock(owner):
+            if force_training or not snapshot.is_current(content_hash):
+                logger.info(f"Treinando o chatbot (snapshot {content_hash[:12]})...")
+                _train(chatbot, snapshot, corpus, corpus_hash, csv_dir, manifest, force_training)
+                snapshot.commit(content_hash, corpus_hash, manifest, chatbot.storage.count())
+    finally:
+        snapshot.release_lock(owner)
+
+    return content_hash
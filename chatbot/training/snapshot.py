@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando o formato dos dados treinados mudar, forçando novo treinamento
+SNAPSHOT_SCHEMA_VERSION = 2
+
+
+def hash_files(paths: Iterable[Path], hasher=None) -> str:
+    """Calcula o hash SHA-256 do nome e conteúdo de um conjunto de arquivos"""
+    hasher = hasher or hashlib.sha256()
+    for path in sorted(Path(p) for p in paths):
+        hasher.update(path.name.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def compute_corpus_hash(corpus: str) -> str:
+    """Hash do conteúdo do corpus do ChatterBot"""
+    from chatterbot.corpus import list_corpus_files
+
+    hasher = hashlib.sha256(f"corpus:{corpus}".encode('utf-8'))
+    return hash_files(list_corpus_files(corpus), hasher)
+
+
+def compute_training_hash(corpus_hash: str, manifest: Dict[str, dict]) -> str:
+    """Hash do treinamento completo: versão do schema, corpus e manifesto dos CSVs"""
+    hasher = hashlib.sha256(f"schema:{SNAPSHOT_SCHEMA_VERSION}:{corpus_hash}".encode('utf-8'))
+    for name in sorted(manifest):
+        hasher.update(f"{name}:{manifest[name]['sha256']}".encode('utf-8'))
+    return hasher.hexdigest()
+
+
+class TrainingSnapshot:
+    """
+    Snapshot versionado do treinamento, persistido no MongoDB.
+
+    O documento `current` guarda o hash do conteúdo que gerou os statements
+    atuais. O documento `lock` garante que apenas uma réplica treine por vez;
+    as demais aguardam o snapshot ficar disponível em vez de retreinar. Enquanto
+    o treinamento roda, `hold_lock` renova o lock a cada terço de `lock_ttl`.
+    """
+
+    def __init__(self, database, collection: str = 'training_snapshots', lock_ttl: int = 1800):
+        self.collection = database[collection]
+        self.lock_ttl = lock_ttl
+
+    def current(self) -> Optional[dict]:
+        """Retorna os metadados do snapshot atual, se existir"""
+        return self.collection.find_one({'_id': 'current'})
+
+    @staticmethod
+    def files(snapshot: Optional[dict]) -> Dict[str, dict]:
+        """Manifesto dos CSVs (nome -> {mtime, size, sha256}) registrado no snapshot"""
+        if not snapshot:
+            return {}
+        return {
+            entry['name']: {key: value for key, value in entry.items() if key != 'name'}
+            for entry in snapshot.get('files', [])
+        }
+
+    def is_current(self, content_hash: str) -> bool:
+        """Verifica se o snapshot atual foi gerado com o hash informado"""
+        snapshot = self.current()
+        return bool(snapshot) and snapshot.get('hash') == content_hash
+
+    def acquire_lock(self, owner: str) -> bool:
+        """Tenta adquirir o lock de treinamento (expira após `lock_ttl` segundos)"""
+        now = datetime.now(timezone.utc)
+        try:
+            self.collection.update_one(
+                {'_id': 'lock', '$or': [{'expires_at': {'$lt': now}}, {'owner': owner}]},
+                {'$set': {'owner': owner, 'expires_at': now + timedelta(seconds=self.lock_ttl)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def renew_lock(self, owner: str) -> bool:
+        """Estende a validade do lock se ainda pertencer a `owner`"""
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.lock_ttl)
+        result = self.collection.update_one({'_id': 'lock', 'owner': owner}, {'$set': {'expires_at': expires_at}})
+        return result.matched_count == 1
+
+    @contextmanager
+    def hold_lock(self, owner: str):
+        """
+        Renova o lock de `owner` em segundo plano enquanto o bloco executa,
+        para que um treinamento mais longo que `lock_ttl` não perca o lock
+        """
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.lock_ttl / 3):
+                try:
+                    if not self.renew_lock(owner):
+                        logger.warning("Lock de treinamento perdido")
+                        return
+                except Exception as e:
+                    logger.error(f"Erro ao renovar lock de treinamento: {str(e)}")
+
+        thread = threading.Thread(target=heartbeat, name="training-lock", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def release_lock(self, owner: str):
+        """Libera o lock de treinamento se ainda pertencer a `owner`"""
+        self.collection.delete_one({'_id': 'lock', 'owner': owner})
+
+    def commit(self, content_hash: str, corpus_hash: str, files: Dict[str, dict], statement_count: int):
+        """Registra o snapshot recém-treinado junto com o manifesto dos CSVs"""
+        self.collection.replace_one(
+            {'_id': 'current'},
+            {
+                'hash': content_hash,
+                'schema_version': SNAPSHOT_SCHEMA_VERSION,
+                'corpus_hash': corpus_hash,
+                # Lista em vez de dicionário: nomes de arquivo contêm pontos
+                'files': [dict(entry, name=name) for name, entry in files.items()],
+                'statement_count': statement_count,
+                'trained_at': datetime.now(timezone.utc)
+            },
+            upsert=True
+        )
+
+    def wait_for(self, content_hash: str, timeout: float, interval: float = 5.0) -> bool:
+        """Aguarda outra réplica publicar o snapshot com o hash informado"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.is_current(content_hash):
+                return True
+            if not self.collection.find_one({'_id': 'lock'}):
+                # Ninguém está treinando: quem chamou deve treinar
+                return False
+            time.sleep(interval)
+        return False
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturated(Exception):
+    """Levantada quando o pool já tem o máximo de requisições pendentes"""
+    pass
+
+
+class ChatWorkerPool:
+    """
+    Executa o processamento bloqueante das mensagens (ChatterBot, MongoDB,
+    Redis) em um pool limitado de threads, liberando o event loop do uvicorn.
+
+    No máximo `max_pending` requisições ficam em andamento ou na fila; acima
+    disso `run` levanta `PoolSaturated` para que a API responda 503. Mensagens
+    do mesmo usuário são serializadas por um lock (listrado por hash do
+    user_id), evitando que duas requisições simultâneas sobrescrevam o estado
+    uma da outra. Um lote (`run_many`) segura os locks de todos os seus
+    usuários, sempre adquiridos em ordem crescente para evitar deadlock.
+    """
+
+    def __init__(self, workers: int = 8, max_pending: int = 64, lock_stripes: int = 256):
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-worker")
+        self._user_locks = [threading.Lock() for _ in range(lock_stripes)]
+        # Acessados apenas pelo event loop, dispensam lock
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+
+    def _stripes(self, user_ids: List[str]) -> List[int]:
+        return sorted({zlib.crc32(user_id.encode('utf-8')) % len(self._user_locks) for user_id in user_ids})
+
+    def _call(self, user_ids: List[str], func: Callable, args: tuple):
+        with ExitStack() as stack:
+            for stripe in self._stripes(user_ids):
+                stack.enter_context(self._user_locks[stripe])
+            return func(*args)
+
+    async def run(self, user_id: str, func: Callable, *args):
+        """Executa `func(*args)` no pool, serializado por usuário"""
+        return await self.run_many([user_id], func, *args)
+
+    async def run_many(self, user_ids: List[str], func: Callable, *args):
+        """Executa `func(*args)` no pool, serializado com todos os usuários informados"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolSaturated()
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._call, user_ids, func, args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,132 @@
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class KeyedDispatcher:
+    """
+    Pool de threads em que cada chave (ex.: chat_id do Telegram) é sempre
+    atendida pela mesma thread.
+
+    Mensagens da mesma conversa são processadas em ordem, uma de cada vez,
+    enquanto conversas diferentes rodam em paralelo. Cada thread tem uma fila
+    limitada a `queue_size` itens; `submit` retorna None quando a fila da
+    chave está cheia, para que o chamador aplique backpressure.
+
+    `submit_after` agenda uma tarefa para depois de um intervalo sem ocupar
+    a thread da chave durante a espera (novas tentativas, limites de taxa).
+    """
+
+    def __init__(self, workers: int = 8, queue_size: int = 256, name: str = "dispatcher"):
+        self.workers = workers
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads: List[threading.Thread] = []
+        self._counter_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._name = name
+        self._timers: list = []
+        self._timer_sequence = itertools.count()
+        self._timer_condition = threading.Condition()
+        self._timer_thread: Optional[threading.Thread] = None
+        self._stopping = False
+        for position, work_queue in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._run, args=(work_queue,), name=f"{name}-{position}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _queue_for(self, key: str) -> queue.Queue:
+        return self._queues[zlib.crc32(str(key).encode('utf-8')) % self.workers]
+
+    def submit(self, key: str, func: Callable, *args, block: bool = False,
+               timeout: Optional[float] = None) -> Optional[Future]:
+        """
+        Enfileira `func(*args)` na thread responsável por `key`.
+        Retorna um Future com o resultado, ou None se a fila estiver cheia.
+        """
+        future = Future()
+        try:
+            self._queue_for(key).put((future, func, args), block=block, timeout=timeout)
+        except queue.Full:
+            with self._counter_lock:
+                self.rejected += 1
+            return None
+        return future
+
+    def submit_after(self, delay: float, key: str, func: Callable, *args):
+        """
+        Enfileira `func(*args)` na thread responsável por `key` depois de
+        `delay` segundos. Tarefas ainda agendadas no `shutdown` são descartadas
+        """
+        with self._timer_condition:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._timer_sequence), key, func, args))
+            if self._timer_thread is None:
+                self._timer_thread = threading.Thread(target=self._run_timers, name=f"{self._name}-timer", daemon=True)
+                self._timer_thread.start()
+            self._timer_condition.notify()
+
+    def _run_timers(self):
+        while True:
+            with self._timer_condition:
+                while not self._stopping:
+                    now = time.monotonic()
+                    if self._timers and self._timers[0][0] <= now:
+                        _, _, key, func, args = heapq.heappop(self._timers)
+                        break
+                    self._timer_condition.wait(self._timers[0][0] - now if self._timers else None)
+                else:
+                    return
+            self.submit(key, func, *args, block=True)
+
+    def _run(self, work_queue: queue.Queue):
+        while True:
+            item = work_queue.get()
+            if item is None:
+                break
+            future, func, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+                with self._counter_lock:
+                    self.processed += 1
+            except Exception as e:
+                logger.error(f"Erro ao processar mensagem: {str(e)}")
+                future.set_exception(e)
+                with self._counter_lock:
+                    self.failed += 1
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'queued': sum(work_queue.qsize() for work_queue in self._queues),
+            'scheduled': len(self._timers),
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+        }
+
+    def shutdown(self):
+        """Processa o que já está nas filas e encerra as threads"""
+        with self._timer_condition:
+            self._stopping = True
+            if self._timers:
+                logger.warning(f"{len(self._timers)} tarefas agendadas descartadas no encerramento")
+            self._timer_condition.notify()
+        if self._timer_thread is not None:
+            self._timer_thread.join()
+        for work_queue in self._queues:
+            work_queue.put(None)
+        for thread in self._threads:
+            thread.join()
@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Chave padrão da lista Redis consumida pelo learn-worker
+DEFAULT_REDIS_KEY = "cnj-chatbot:learning"
+
+
+class LearningEvent(NamedTuple):
+    """Mensagem do usuário e resposta escolhida, a serem gravadas como statements"""
+    text: str
+    response: str
+    conversation: str
+    persona: str
+    created_at: float
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str) -> 'LearningEvent':
+        return cls(**json.loads(raw))
+
+
+def learning_statements(events: List[LearningEvent]) -> list:
+    """
+    Converte os eventos nos statements que `Responder` gravaria no modo
+    síncrono: a mensagem do usuário e a resposta do bot a ela
+    """
+    from chatterbot.conversation import Statement
+
+    statements = []
+    for event in events:
+        created_at = datetime.fromtimestamp(event.created_at)
+        statements.append(Statement(
+            text=event.text,
+            conversation=event.conversation,
+            created_at=created_at
+        ))
+        statements.append(Statement(
+            text=event.response,
+            in_response_to=event.text,
+            conversation=event.conversation,
+            persona=event.persona,
+            created_at=created_at
+        ))
+    return statements
+
+
+class MongoLearningSink:
+    """Grava os eventos no MongoDB com um único insert_many por lote"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def write(self, events: List[LearningEvent]):
+        # O storage calcula o search_text (tagger) aqui, fora do caminho da requisição
+        self.storage.create_many(learning_statements(events))
+
+
+class RedisLearningSink:
+    """
+    Publica os eventos em uma lista Redis consumida por `main.py --mode learn-worker`.
+    A lista guarda no máximo `max_events` eventos, descartando os mais antigos.
+    """
+
+    def __init__(self, client, key: str = DEFAULT_REDIS_KEY, max_events: int = 100000):
+        self.client = client
+        self.key = key
+        self.max_events = max_events
+
+    def write(self, events: List[LearningEvent]):
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.rpush(self.key, *[event.to_json() for event in events])
+        if self.max_events:
+            pipeline.ltrim(self.key, -self.max_events, -1)
+        pipeline.execute()
+
+
+class LearningQueue:
+    """
+    Fila limitada de eventos de aprendizado gravados em segundo plano (write-behind).
+
+    `put` nunca acessa o MongoDB: apenas enfileira o evento. Uma thread daemon
+    grava os eventos em lotes de até `batch_size`, a cada `flush_interval`
+    segundos ou assim que um lote completo se acumula. Com a fila cheia, a
+    política define o que acontece:
+
+    - `drop_newest`: descarta o evento novo;
+    - `drop_oldest`: descarta o evento mais antigo da fila;
+    - `block`: aguarda espaço por até `put_timeout` segundos e então descarta.
+
+    Se a gravação falhar, o lote volta para o início da fila (no limite da
+    capacidade) e é tentado de novo no próximo ciclo.
+    """
+
+    POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+    def __init__(self, sink, max_size: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 1.0, policy: str = 'drop_newest', put_timeout: float = 0.05):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de descarte inválida: {policy}")
+        self.sink = sink
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.put_timeout = put_timeout
+        self._events: deque = deque()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def put(self, event: LearningEvent) -> bool:
+        """Enfileira o evento; retorna False se ele foi descartado"""
+        with self._condition:
+            if len(self._events) >= self.max_size:
+                if self.policy == 'drop_oldest':
+                    self._events.popleft()
+                    self.dropped += 1
+                elif self.policy == 'block':
+                    self._condition.wait_for(lambda: len(self._events) < self.max_size, self.put_timeout)
+                if len(self._events) >= self.max_size:
+                    self.dropped += 1
+                    return False
+            self._events.append(event)
+            self.enqueued += 1
+            if len(self._events) >= self.batch_size:
+                self._condition.notify_all()
+        return True
+
+    def _take_batch(self) -> List[LearningEvent]:
+        with self._condition:
+            batch = [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+            self._condition.notify_all()
+        return batch
+
+    def flush(self) -> int:
+        """Grava todos os eventos pendentes; retorna quantos foram gravados"""
+        written = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return written
+            try:
+                self.sink.write(batch)
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"Erro ao gravar {len(batch)} eventos de aprendizado: {str(e)}")
+                self._requeue(batch)
+                return written
+            self.written += len(batch)
+            written += len(batch)
+
+    def _requeue(self, batch: List[LearningEvent]):
+        with self._condition:
+            room = max(self.max_size - len(self._events), 0)
+            self.dropped += len(batch) - min(room, len(batch))
+            self._events.extendleft(reversed(batch[:room]))
+
+    def start(self):
+        """Inicia a thread de gravação em segundo plano"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self._stopping or len(self._events) >= self.batch_size,
+                        self.flush_interval
+                    )
+                    stopping = self._stopping
+                self.flush()
+                if stopping:
+                    return
+
+        self._thread = threading.Thread(target=run, name="learning-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Grava o que estiver pendente e encerra a thread"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        else:
+            self.flush()
+
+    def stats(self) -> dict:
+        return {
+            'policy': self.policy,
+            'queued': len(self._events),
+            'max_size': self.max_size,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed_flushes': self.failed_flushes,
+        }
+
+
+def create_learning_queue(mode: str, storage=None, redis_client=None) -> Optional[LearningQueue]:
+    """
+    Cria e inicia a fila de aprendizado para o LEARNING_MODE informado:
+    `queue` grava no MongoDB pelo próprio processo e `redis` publica para o
+    learn-worker. Nos modos `sync` e `off` não há fila (retorna None).
+    """
+    if mode in ('sync', 'off'):
+        return None
+    if mode == 'queue':
+        sink = MongoLearningSink(storage)
+    elif mode == 'redis':
+        if redis_client is None:
+            from state.redis_client import create_redis_client
+            redis_client = create_redis_client()
+        sink = RedisLearningSink(
+            redis_client,
+            key=os.getenv('LEARNING_REDIS_KEY', DEFAULT_REDIS_KEY),
+            max_events=int(os.getenv('LEARNING_REDIS_MAX_EVENTS', '100000'))
+        )
+    else:
+        raise ValueError(f"LEARNING_MODE inválido: {mode}")
+
+    queue = LearningQueue(
+        sink,
+        max_size=int(os.getenv('LEARNING_QUEUE_SIZE', '10000')),
+        batch_size=int(os.getenv('LEARNING_BATCH_SIZE', '200')),
+        flush_interval=float(os.getenv('LEARNING_FLUSH_SECONDS', '1')),
+        policy=os.getenv('LEARNING_DROP_POLICY', 'drop_newest')
+    )
+    queue.start()
+    return queue
+
+
+def consume_redis_learning(client, sink: MongoLearningSink, key: str = DEFAULT_REDIS_KEY,
+                           batch_size: int = 500, idle_seconds: float = 1.0,
+                           should_stop: Callable[[], bool] = lambda: False):
+    """
+    Consome a lista Redis e grava os eventos no MongoDB em lotes.
+
+    O lote só é removido da lista (LTRIM) depois de gravado, então uma falha
+    no meio do caminho não perde eventos; em troca, deve haver um único
+    consumidor por chave.
+    """
+    while not should_stop():
+        raw_events = client.lrange(key, 0, batch_size - 1)
+        if not raw_events:
+            time.sleep(idle_seconds)
+            continue
+        events = []
+        for raw in raw_events:
+            try:
+                events.append(LearningEvent.from_json(raw))
+            except (ValueError, TypeError):
+                logger.warning(f"Evento de aprendizado inválido descartado: {raw!r}")
+        try:
+            if events:
+                sink.write(events)
+        except Exception as e:
+            logger.error(f"Erro ao gravar {len(raw_events)} eventos de aprendizado: {str(e)}")
+            time.sleep(idle_seconds)
+            continue
+        client.ltrim(key, len(raw_events), -1)
+        logger.info(f"{len(raw_events)} eventos de aprendizado gravados")